@@ -0,0 +1,101 @@
+import heapq
+import threading
+
+try:
+    import sync_profile as sync
+except ImportError:
+    # Only next to the problems when run by the harness, which can profile them.
+    import threading as sync
+
+
+class SimulatedClock(object):
+    """A virtual clock for threads, which jumps straight to the next wake up once they're all blocked.
+
+    Every thread taking part is started with `start_thread`, and only ever blocks in `sleep` or
+    on one of the clock's semaphores, so the clock knows how many are still running.  Once none
+    are, nothing else can happen before the earliest sleeper is due, so time skips ahead to it.
+    A second of simulated time then costs nothing like a second of wall time.
+    """
+
+    def __init__(self):
+        self.condition = sync.Condition()
+        self.now = 0.0
+        # The thread making the clock counts as running too.
+        self.running = 1
+        self.wake_ups = []
+
+    def _advance(self):
+        """Moves time on to the next wake up if nothing is running. Call holding the condition."""
+        if self.running > 0 or len(self.wake_ups) == 0:
+            return
+
+        self.now = self.wake_ups[0]
+        while len(self.wake_ups) > 0 and self.wake_ups[0] <= self.now:
+            heapq.heappop(self.wake_ups)
+            # They count as running from now, so time can't move on before they do.
+            self.running += 1
+        self.condition.notify_all()
+
+    def start_thread(self, target, *args):
+        def run():
+            try:
+                target(*args)
+            finally:
+                with self.condition:
+                    self.running -= 1
+                    self._advance()
+
+        with self.condition:
+            self.running += 1
+        thread = threading.Thread(target = run)
+        thread.start()
+        return thread
+
+    def sleep(self, duration):
+        with self.condition:
+            wake_up = self.now + duration
+            heapq.heappush(self.wake_ups, wake_up)
+            self.running -= 1
+            self._advance()
+            while self.now < wake_up:
+                self.condition.wait()
+
+    def semaphore(self, value = 0):
+        return SimulatedSemaphore(self, value)
+
+
+class SimulatedSemaphore(object):
+    """A semaphore whose waiters don't count as running on its clock.
+
+    A release hands its permit straight to a waiter (and counts it as running again), so the
+    clock can't skip ahead between a waiter being released and actually waking up.
+    """
+
+    def __init__(self, clock, value = 0):
+        self.clock = clock
+        self.value = value
+        self.waiters = 0
+        self.handoffs = 0
+
+    def acquire(self):
+        with self.clock.condition:
+            if self.value > 0:
+                self.value -= 1
+                return
+
+            self.waiters += 1
+            self.clock.running -= 1
+            self.clock._advance()
+            while self.handoffs == 0:
+                self.clock.condition.wait()
+            self.handoffs -= 1
+
+    def release(self):
+        with self.clock.condition:
+            if self.waiters > 0:
+                self.waiters -= 1
+                self.handoffs += 1
+                self.clock.running += 1
+                self.clock.condition.notify_all()
+            else:
+                self.value += 1
@@ -1,106 +1,126 @@
-import os
-from threading import Thread, Lock, Event
-import time
+import collections
 import random
-import names
-
-mutex = Lock()
-
-# Interval in seconds
-customerIntervalMin = 1
-customerIntervalMax = 1
-haircutDurationMin = 1
-haircutDurationMax = 1
-customers_served = 0
-
-
-class BarberShop:
-    waitingCustomers = []
-
-    def __init__(self, barber, numberOfSeats):
-        self.barber = barber
-        self.numberOfSeats = numberOfSeats
-        print('BarberShop initilized with {0} seats'.format(numberOfSeats))
-        print('Customer min interval {0}'.format(customerIntervalMin))
-        print('Customer max interval {0}'.format(customerIntervalMax))
-        print('Haircut min duration {0}'.format(haircutDurationMin))
-        print('Haircut max duration {0}'.format(customerIntervalMax))
-        print('---------------------------------------')
-
-    def openShop(self):
-        print('Barber shop is opening')
-        workingThread = Thread(target = self.barberGoToWork)
-        workingThread.start()
-
-    def barberGoToWork(self):
+import time
+import humanfriendly
+
+from _sim import SimulatedClock
+
+try:
+    import sync_profile as sync
+except ImportError:
+    # Only next to the problems when run by the harness, which can profile them.
+    import threading as sync
+
+
+class Customer(object):
+    def __init__(self, clock, number):
+        self.number = number
+        self.arrived = clock.now
+        self.wait = None
+        # Released by the barber when they call the customer over, and when the haircut is done.
+        self.ready = clock.semaphore(0)
+        self.done = clock.semaphore(0)
+
+
+class BarberShop(object):
+    """The book's barbershop, with any number of barbers sharing a bounded waiting room.
+
+    Customers sit down (or leave, if every seat is taken) and signal `customers`, barbers wait
+    on it and call the first customer over.  Closing wakes every barber with nobody waiting,
+    which tells them to go home.
+    """
+
+    def __init__(self, clock, num_barbers, num_seats, haircut_duration, seed = 0):
+        self.clock = clock
+        self.num_barbers = num_barbers
+        self.num_seats = num_seats
+        self.haircut_duration = haircut_duration
+        self.random = random.Random(seed)
+
+        self.mutex = sync.Lock()
+        self.customers = clock.semaphore(0)
+        self.left = clock.semaphore(0)
+        self.waiting = collections.deque()
+        self.barbers = []
+
+        self.served = 0
+        self.balked = 0
+        self.wait_times = []
+
+    def open(self):
+        self.barbers = [self.clock.start_thread(self.barber) for _ in range(self.num_barbers)]
+
+    def close(self):
+        """Sends every barber home, once the waiting room is empty."""
+        for _ in self.barbers:
+            self.customers.release()
+        for barber in self.barbers:
+            barber.join()
+
+    def barber(self):
         while True:
-            mutex.acquire()
-            global customers_served
-            customers_served += 1
-
-            if len(self.waitingCustomers) > 0:
-                c = self.waitingCustomers[0]
-                del self.waitingCustomers[0]
-                mutex.release()
-                self.barber.cutHair(c)
+            self.customers.acquire()
+            with self.mutex:
+                if len(self.waiting) == 0:
+                    return
+                customer = self.waiting.popleft()
+
+            customer.wait = self.clock.now - customer.arrived
+            customer.ready.release()
+            self.clock.sleep(self.random.expovariate(1.0 / self.haircut_duration))
+            customer.done.release()
+
+    def enter(self, customer):
+        with self.mutex:
+            full = len(self.waiting) == self.num_seats
+            if full:
+                self.balked += 1
             else:
-                mutex.release()
-                print('Aaah, all done, going to sleep')
-                barber.sleep()
-                print('Barber woke up')
-
-    def enterBarberShop(self, customer):
-        mutex.acquire()
-        print('>> {0} entered the shop and is looking for a seat'.format(customer.name))
-
-        if len(self.waitingCustomers) == self.numberOfSeats:
-            print('Waiting room is full, {0} is leaving.'.format(customer.name))
-            mutex.release()
-        else:
-            print('{0} sat down in the waiting room'.format(customer.name))
-            self.waitingCustomers.append(c)
-            mutex.release()
-            barber.wakeUp()
-
-
-class Customer:
-    def __init__(self, name):
-        self.name = name
-
-
-class Barber:
-    barberWorkingEvent = Event()
-
-    def sleep(self):
-        self.barberWorkingEvent.wait()
+                self.waiting.append(customer)
 
-    def wakeUp(self):
-        self.barberWorkingEvent.set()
+        if not full:
+            self.customers.release()
+            customer.ready.acquire()
+            customer.done.acquire()
+            with self.mutex:
+                self.served += 1
+                self.wait_times.append(customer.wait)
+        self.left.release()
 
-    def cutHair(self, customer):
-        # Set barber as busy
-        self.barberWorkingEvent.clear()
 
-        print('{0} is having a haircut'.format(customer.name))
+def simulate(num_customers, num_barbers, num_seats, arrival_interval, haircut_duration, seed = 0):
+    """Drives customers through the shop on a simulated clock, returns it once they've all left."""
+    clock = SimulatedClock()
+    shop = BarberShop(clock, num_barbers, num_seats, haircut_duration, seed)
+    arrivals = random.Random(seed + 1)
 
-        randomHairCuttingTime = random.randrange(haircutDurationMin, haircutDurationMax + 1)
-        time.sleep(randomHairCuttingTime)
-        print('{0} is done'.format(customer.name))
+    shop.open()
+    for number in range(num_customers):
+        clock.sleep(arrivals.expovariate(1.0 / arrival_interval))
+        clock.start_thread(shop.enter, Customer(clock, number))
 
+    for _ in range(num_customers):
+        shop.left.acquire()
+    shop.close()
+    return shop
 
 
 if __name__ == '__main__':
-    if os.path.exists("/.dockerenv"):
-        exit(0)
-    customers = list(map(lambda _: Customer(names.get_first_name()), range(10)))
-    barber = Barber()
-
-    barberShop = BarberShop(barber, numberOfSeats = 1)
-    barberShop.openShop()
-    initial_num_customers = len(customers) - 1
-
-    for c in customers:
-        # New customer enters the barbershop
-        barberShop.enterBarberShop(c)
-        customerInterval = random.randrange(customerIntervalMin, customerIntervalMax + 1)
-        time.sleep(customerInterval)
+    num_customers = 5000
+    num_barbers = 3
+    num_seats = 5
+    # Mean (simulated) seconds between customers arriving, and for a haircut.
+    arrival_interval = 0.4
+    haircut_duration = 1.0
+
+    print("Opening the shop")
+    start = time.time()
+    shop = simulate(num_customers, num_barbers, num_seats, arrival_interval, haircut_duration)
+    elapsed = time.time() - start
+
+    wait_times = sorted(shop.wait_times)
+    print("Served {0}, balked {1} ({2:.1%})".format(shop.served, shop.balked, shop.balked / num_customers))
+    print("Throughput: {0:.3f} customers/s (simulated {1:.1f}s)".format(shop.served / shop.clock.now, shop.clock.now))
+    print("Wait: mean {0:.3f}s, p95 {1:.3f}s".format(sum(wait_times) / max(1, len(wait_times)),
+                                                     wait_times[int(0.95 * (len(wait_times) - 1))] if wait_times else 0.0))
+    print(humanfriendly.format_timespan(elapsed))
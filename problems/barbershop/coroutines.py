@@ -0,0 +1,80 @@
+import asyncio
+import random
+import time
+import humanfriendly
+
+from problem_metrics import rss
+
+
+class BarberShop(object):
+    """The barbershop as tasks: the waiting room is a bounded queue of customers' done events."""
+
+    def __init__(self, num_seats):
+        self.waiting = asyncio.Queue(maxsize = num_seats)
+        self.served = 0
+        self.balked = 0
+        self.wait_times = []
+
+    async def barber(self, haircut_duration):
+        while True:
+            customer = await self.waiting.get()
+            if customer is None:
+                return
+            arrived, done = customer
+            self.wait_times.append(time.perf_counter() - arrived)
+            await asyncio.sleep(haircut_duration)
+            done.set()
+
+    async def customer(self, arrival):
+        await asyncio.sleep(arrival)
+        if self.waiting.full():
+            self.balked += 1
+            return
+
+        done = asyncio.Event()
+        self.waiting.put_nowait((time.perf_counter(), done))
+        await done.wait()
+        self.served += 1
+
+
+async def run_shop(num_customers, num_barbers, num_seats, arrival_window, haircut_duration, seed = 0):
+    """Starts every barber and customer as tasks, returns the shop and the memory they took once parked."""
+    shop = BarberShop(num_seats)
+    arrivals = random.Random(seed)
+
+    before = rss()
+    barbers = [asyncio.ensure_future(shop.barber(haircut_duration)) for _ in range(num_barbers)]
+    customers = [asyncio.ensure_future(shop.customer(arrivals.uniform(0, arrival_window)))
+                 for _ in range(num_customers)]
+    # Once they've all started and are parked, waiting on something.
+    await asyncio.sleep(0)
+    memory = rss() - before
+
+    await asyncio.gather(*customers)
+    for _ in barbers:
+        await shop.waiting.put(None)
+    await asyncio.gather(*barbers)
+    return shop, memory
+
+
+if __name__ == "__main__":
+    num_customers = 10000
+    num_barbers = 100
+    num_seats = 1000
+    # Customers arrive uniformly over this many seconds, and a haircut takes this long.
+    arrival_window = 1.0
+    haircut_duration = 0.001
+
+    print("Opening the shop")
+    start = time.time()
+    shop, memory = asyncio.get_event_loop().run_until_complete(
+        run_shop(num_customers, num_barbers, num_seats, arrival_window, haircut_duration))
+    elapsed = time.time() - start
+
+    wait_times = sorted(shop.wait_times)
+    print("Served {0}, balked {1} ({2:.1%})".format(shop.served, shop.balked, shop.balked / num_customers))
+    print("Throughput: {0:.1f} customers/s".format(shop.served / elapsed))
+    print("Wait: mean {0:.6f}s, p95 {1:.6f}s".format(sum(wait_times) / max(1, len(wait_times)),
+                                                     wait_times[int(0.95 * (len(wait_times) - 1))] if wait_times else 0.0))
+    print("{0} per task".format(humanfriendly.format_size(int(memory / (num_customers + num_barbers)))))
+    print(humanfriendly.format_timespan(elapsed))
@@ -0,0 +1,105 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Scales the MAD so it estimates the standard deviation of normally distributed samples.
+MAD_SCALE = 1.4826
+
+
+def find_outliers(values, threshold = 3.5):
+    """Flags the values more than `threshold` (scaled) MADs away from the median."""
+    values = np.asarray(values, dtype = float)
+    if len(values) < 3:
+        return np.zeros(len(values), dtype = bool)
+
+    median = np.median(values)
+    mad = np.median(np.abs(values - median)) * MAD_SCALE
+    if mad == 0:
+        return values != median
+    return np.abs(values - median) / mad > threshold
+
+
+def bootstrap_ci(values, statistic = np.median, confidence = 0.95, resamples = 1000, seed = 0):
+    """Percentile bootstrap confidence interval of a statistic, as (low, high)."""
+    values = np.asarray(values, dtype = float)
+    if len(values) < 2:
+        value = statistic(values) if len(values) == 1 else np.nan
+        return value, value
+
+    rng = np.random.RandomState(seed)
+    resampled = values[rng.randint(0, len(values), size = (resamples, len(values)))]
+    estimates = statistic(resampled, axis = 1)
+    alpha = (1 - confidence) / 2
+    return np.percentile(estimates, 100 * alpha), np.percentile(estimates, 100 * (1 - alpha))
+
+
+def summarize(values, confidence = 0.95, resamples = 1000, threshold = 3.5):
+    """Median, spread and bootstrap CI of the samples that aren't outliers."""
+    values = np.asarray(values, dtype = float)
+    outliers = find_outliers(values, threshold)
+    kept = values[~outliers]
+    if len(kept) == 0:
+        kept = values
+
+    ci_low, ci_high = bootstrap_ci(kept, confidence = confidence, resamples = resamples)
+    median = np.median(kept) if len(kept) > 0 else np.nan
+    return {
+        "samples": len(values),
+        "outliers": int(outliers.sum()),
+        "median": median,
+        "mean": np.mean(kept) if len(kept) > 0 else np.nan,
+        "std": np.std(kept, ddof = 1) if len(kept) > 1 else 0.0,
+        "mad": np.median(np.abs(kept - median)) * MAD_SCALE if len(kept) > 0 else np.nan,
+        "ci_low": ci_low,
+        "ci_high": ci_high,
+    }
+
+
+def is_converged(values, target_ci, min_samples = 3, confidence = 0.95, resamples = 1000, threshold = 3.5):
+    """Whether the CI of the median is within `target_ci` (relative) of the median either side.
+
+    A target of 0 never converges, so every sample gets run.
+    """
+    if target_ci <= 0 or len(values) < min_samples:
+        return False
+
+    summary = summarize(values, confidence, resamples, threshold)
+    if summary["median"] == 0:
+        return True
+    half_width = (summary["ci_high"] - summary["ci_low"]) / 2
+    return bool(half_width / abs(summary["median"]) <= target_ci)
+
+
+def mann_whitney(a, b):
+    """Two sided p-value of the Mann-Whitney U test, using the normal approximation with ties."""
+    a, b = np.asarray(a, dtype = float), np.asarray(b, dtype = float)
+    n1, n2 = len(a), len(b)
+    if n1 == 0 or n2 == 0:
+        return math.nan
+
+    ranks = pd.Series(np.concatenate([a, b])).rank().values
+    u = ranks[:n1].sum() - n1 * (n1 + 1) / 2.0
+    mean = n1 * n2 / 2.0
+
+    _, tie_counts = np.unique(ranks, return_counts = True)
+    n = n1 + n2
+    variance = n1 * n2 / 12.0 * ((n + 1) - (tie_counts ** 3 - tie_counts).sum() / float(n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+
+    z = (abs(u - mean) - 0.5) / math.sqrt(variance)
+    return min(1.0, math.erfc(max(z, 0.0) / math.sqrt(2)))
+
+
+def min_p_value(n1, n2):
+    """The smallest p-value mann_whitney can give for samples of these sizes, when they don't overlap at all."""
+    return mann_whitney(np.arange(n1), np.arange(n1, n1 + n2))
+
+
+def min_testable_samples(alpha, limit = 100):
+    """The fewest samples a side for mann_whitney to be able to reach alpha, so a regression can show up."""
+    for n in range(2, limit + 1):
+        if min_p_value(n, n) < alpha:
+            return n
+    return limit
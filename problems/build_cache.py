@@ -0,0 +1,75 @@
+import hashlib
+import logging
+import os
+
+from docker.errors import ImageNotFound
+
+
+def _hash_path(digest, path):
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            for file in sorted(files):
+                _hash_path(digest, os.path.join(root, file))
+        return
+
+    digest.update(path.encode("utf-8"))
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+
+
+def hash_dockerfile(dockerfile, context = "."):
+    """Hashes a Dockerfile along with every file it ADDs from the build context."""
+    digest = hashlib.sha256()
+    with open(dockerfile, "rb") as f:
+        contents = f.read()
+    digest.update(contents)
+
+    for line in contents.decode("utf-8").splitlines():
+        parts = line.split()
+        # COPY --from copies between stages, so only ADD/COPY from the context matter.
+        if len(parts) >= 3 and parts[0] in ["ADD", "COPY"] and not parts[1].startswith("--"):
+            for source in parts[1:-1]:
+                _hash_path(digest, os.path.normpath(os.path.join(context, source)))
+
+    return digest.hexdigest()
+
+
+class BuildCache(object):
+    """Only builds an image when its Dockerfile or any of its sources changed.
+
+    Every build is also tagged with the hash of its inputs, so if that tag already
+    exists the image is up to date and is just re-tagged.
+    """
+
+    def __init__(self, client, enabled = True):
+        self.client = client
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def build(self, dockerfile, image_name, context = "."):
+        repository, tag = image_name.rsplit(":", 1)
+        content_tag = hash_dockerfile(dockerfile, context)[:16]
+
+        if self.enabled:
+            try:
+                image = self.client.images.get("{0}:{1}".format(repository, content_tag))
+                image.tag(repository, tag)
+                self.hits += 1
+                logging.info("Build cache hit: {0} ({1})".format(image_name, content_tag))
+                return image
+            except ImageNotFound:
+                pass
+
+        self.misses += 1
+        logging.info("Build cache miss: {0} ({1})".format(image_name, content_tag))
+        image, build_logs = self.client.images.build(path = context,
+                                                     dockerfile = "./" + dockerfile,
+                                                     tag = image_name)
+        image.tag(repository, content_tag)
+        return image
+
+    def log_summary(self):
+        logging.info("Build cache: {0} hits, {1} misses".format(self.hits, self.misses))
@@ -0,0 +1,162 @@
+import logging
+import math
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+import benchmark_stats
+from results_store import ResultStore
+from testing import get_args, _configure_logging
+
+
+def load_samples(store_path, metric, problems = None, threshold = 3.5):
+    """Loads the current samples of every test (or just some problems), without their outliers."""
+    df = ResultStore(store_path).load_current("samples", problem = problems)
+    if len(df) == 0:
+        return df
+
+    outliers = df.groupby(["problem", "runtime", "file"])[metric].transform(
+        lambda values: benchmark_stats.find_outliers(values, threshold))
+    return df[~outliers.astype(bool)]
+
+
+def load_summaries(store_path, problems = None):
+    """The latest summary of every test, with the bootstrap CIs of its current samples."""
+    df = ResultStore(store_path).load_current("summaries", problem = problems)
+    # Every run writes a summary of all the samples so far, so the last one covers the others.
+    return df.groupby(["problem", "runtime", "file"]).tail(1)
+
+
+def compare_implementations(df, metric, reference, alpha, summaries = None):
+    """One table per problem, comparing every (runtime, file) against the reference implementation.
+
+    The CI of each median comes from its stored summary, when there is one for the metric.
+    """
+    cis = {}
+    if summaries is not None and metric + "_ci_low" in summaries.columns:
+        for row in summaries.itertuples(index = False):
+            cis[(row.problem, row.runtime, row.file)] = (getattr(row, metric + "_ci_low"),
+                                                         getattr(row, metric + "_ci_high"))
+
+    tables = {}
+    for problem, problem_df in df.groupby("problem"):
+        groups = {name: group[metric].dropna().values for name, group in problem_df.groupby(["runtime", "file"])}
+        medians = {name: np.median(values) for name, values in groups.items() if len(values) > 0}
+        if len(medians) == 0:
+            continue
+
+        # Compare against the fastest implementation in the reference runtime, or overall.
+        candidates = [name for name in medians if name[0] == reference] or list(medians)
+        reference_name = min(candidates, key = lambda name: medians[name])
+        reference_values = groups[reference_name]
+
+        rows = []
+        for name in sorted(medians):
+            values = groups[name]
+            p_value = benchmark_stats.mann_whitney(values, reference_values) if name != reference_name else math.nan
+            ci_low, ci_high = cis.get((problem,) + name, (math.nan, math.nan))
+            rows.append({
+                "runtime": name[0],
+                "file": name[1],
+                "samples": len(values),
+                "median": medians[name],
+                "ci_low": ci_low,
+                "ci_high": ci_high,
+                "mean": np.mean(values),
+                "std": np.std(values, ddof = 1) if len(values) > 1 else 0.0,
+                "reference": "{0}_{1}".format(*reference_name),
+                "speedup": medians[reference_name] / medians[name] if medians[name] != 0 else math.nan,
+                "p_value": p_value,
+                "significant": bool(p_value < alpha) if not math.isnan(p_value) else False,
+            })
+
+        tables[problem] = pd.DataFrame(rows, columns = ["runtime", "file", "samples", "median", "ci_low", "ci_high",
+                                                        "mean", "std", "reference", "speedup", "p_value", "significant"])
+    return tables
+
+
+def find_regressions(current, baseline, metric, threshold, alpha):
+    """Implementations whose median got significantly slower than in the baseline run."""
+    rows = []
+    baseline_groups = {name: group[metric].dropna().values
+                       for name, group in baseline.groupby(["problem", "runtime", "file"])}
+
+    for name, group in current.groupby(["problem", "runtime", "file"]):
+        values = group[metric].dropna().values
+        if name not in baseline_groups or len(values) == 0 or len(baseline_groups[name]) == 0:
+            continue
+
+        baseline_median = np.median(baseline_groups[name])
+        median = np.median(values)
+        change = (median - baseline_median) / baseline_median if baseline_median != 0 else math.nan
+        p_value = benchmark_stats.mann_whitney(values, baseline_groups[name])
+        # With too few samples, even a clear slowdown can't be significant.
+        testable = benchmark_stats.min_p_value(len(values), len(baseline_groups[name])) < alpha
+        rows.append({
+            "problem": name[0],
+            "runtime": name[1],
+            "file": name[2],
+            "baseline_median": baseline_median,
+            "median": median,
+            "change": change,
+            "p_value": p_value,
+            "testable": testable,
+            "regression": bool(change > threshold and p_value < alpha),
+        })
+
+    return pd.DataFrame(rows, columns = ["problem", "runtime", "file", "baseline_median", "median",
+                                         "change", "p_value", "testable", "regression"])
+
+
+if __name__ == "__main__":
+    _configure_logging()
+    configs = get_args("compare.yaml")
+
+    problems = configs.problem.split(",") if configs.problem is not None else None
+    current = load_samples(configs.store, configs.metric, problems, configs.outlier_threshold)
+    logging.info("Loaded {0} samples from {1}".format(len(current), configs.store))
+
+    if not os.path.exists(configs.output):
+        os.makedirs(configs.output)
+
+    summaries = load_summaries(configs.store, problems)
+    for problem, table in compare_implementations(current, configs.metric, configs.reference, configs.alpha,
+                                                  summaries).items():
+        print("\n{0} ({1})".format(problem, configs.metric))
+        print(table.to_string(index = False))
+        table.to_csv(os.path.join(configs.output, problem + ".csv"))
+
+    if configs.save_baseline:
+        logging.info("Saving baseline run to: {0}".format(configs.baseline))
+        shutil.copyfile(configs.store, configs.baseline)
+        exit(0)
+
+    if not os.path.exists(configs.baseline):
+        logging.warning("No baseline run found, not checking for regressions.")
+        exit(0)
+
+    baseline = load_samples(configs.baseline, configs.metric, problems, configs.outlier_threshold)
+    regressions = find_regressions(current, baseline, configs.metric, configs.regression_threshold, configs.alpha)
+    print("\nAgainst baseline ({0})".format(configs.baseline))
+    print(regressions.to_string(index = False))
+    regressions.to_csv(os.path.join(configs.output, "regressions.csv"))
+
+    failed = False
+    untestable = regressions[~regressions["testable"]]
+    if len(untestable) > 0:
+        # e.g. 3 samples a side can't get below p = 0.08, so a regression would pass unnoticed.
+        logging.log(logging.ERROR if configs.require_testable else logging.WARNING,
+                    "{0} test(s) have too few samples to ever be a significant regression at alpha = {1}: {2}".format(
+                        len(untestable), configs.alpha,
+                        ", ".join("/".join(row[:3]) for row in untestable.itertuples(index = False))))
+        failed = configs.require_testable
+
+    if regressions["regression"].any():
+        logging.error("Found {0} regression(s).".format(int(regressions["regression"].sum())))
+        failed = True
+
+    if failed:
+        sys.exit(1)
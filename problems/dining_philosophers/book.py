@@ -0,0 +1,59 @@
+import time
+import humanfriendly
+
+from problem_metrics import Blocked, get_sizes, report
+
+try:
+    import sync_profile as sync
+except ImportError:
+    # Only next to the problems when run by the harness, which can profile them.
+    import threading as sync
+
+
+def philosopher(i, n, stop, footman, forks, meals, blocked):
+    right, left = forks[i], forks[(i + 1) % n]
+    while not stop.is_set():
+        # Think.
+        time.sleep(0)
+        with blocked[i]:
+            # The footman only lets n - 1 sit down at once, so someone can always eat.
+            footman.acquire()
+            right.acquire()
+            left.acquire()
+        meals[i] += 1
+        # Eat.
+        time.sleep(0)
+        right.release()
+        left.release()
+        footman.release()
+
+
+def dine(n, duration):
+    footman = sync.Semaphore(n - 1)
+    forks = [sync.Semaphore(1) for _ in range(n)]
+    meals = [0] * n
+    blocked = [Blocked() for _ in range(n)]
+    stop = sync.Event()
+
+    philosophers = [sync.Thread(target = philosopher, args = (i, n, stop, footman, forks, meals, blocked))
+                    for i in range(n)]
+    start = time.perf_counter()
+    for p in philosophers:
+        p.start()
+    # Everyone eats for as long as they can, so how many meals each got shows who starved.
+    time.sleep(duration)
+    stop.set()
+    for p in philosophers:
+        p.join()
+    return time.perf_counter() - start, meals, blocked
+
+
+if __name__ == "__main__":
+    # How many philosophers, and how many seconds they dine for.
+    ns, duration = get_sizes([5, 50, 500, 2000], 1.0)
+
+    start = time.time()
+    for n in ns:
+        elapsed, meals, blocked = dine(n, duration)
+        report("footman", n, duration, elapsed, meals, blocked, m_name = "seconds")
+    print(humanfriendly.format_timespan(time.time() - start))
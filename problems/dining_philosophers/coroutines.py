@@ -0,0 +1,48 @@
+import asyncio
+import time
+import humanfriendly
+
+from problem_metrics import rss
+
+
+async def philosopher(footman, left, right, bites, meals):
+    for _ in range(bites):
+        # Think.
+        await asyncio.sleep(0)
+        # The footman only lets all but one sit down at once, so someone can always eat.
+        async with footman:
+            async with right:
+                async with left:
+                    meals.append(1)
+                    # Eat.
+                    await asyncio.sleep(0)
+
+
+async def dine(num_philosophers, bites):
+    """Seats every philosopher as a task, returns the meals and the memory they took once parked."""
+    footman = asyncio.Semaphore(num_philosophers - 1)
+    forks = [asyncio.Lock() for _ in range(num_philosophers)]
+    meals = []
+
+    before = rss()
+    tasks = [asyncio.ensure_future(philosopher(footman, forks[(i + 1) % num_philosophers], forks[i], bites, meals))
+             for i in range(num_philosophers)]
+    # Once they've all started and are parked, waiting on something.
+    await asyncio.sleep(0)
+    memory = rss() - before
+    await asyncio.gather(*tasks)
+    return len(meals), memory
+
+
+if __name__ == "__main__":
+    num_philosophers = 10000
+    bites = 4
+
+    print("Seating {0} philosophers".format(num_philosophers))
+    start = time.time()
+    meals, memory = asyncio.get_event_loop().run_until_complete(dine(num_philosophers, bites))
+    elapsed = time.time() - start
+
+    print("{0} meals, {1:.1f} meals/s".format(meals, meals / elapsed))
+    print("{0} per philosopher".format(humanfriendly.format_size(int(memory / num_philosophers))))
+    print(humanfriendly.format_timespan(elapsed))
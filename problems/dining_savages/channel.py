@@ -0,0 +1,80 @@
+import queue
+import time
+import humanfriendly
+
+from problem_metrics import Blocked, get_sizes, report
+
+try:
+    import sync_profile as sync
+except ImportError:
+    # Only next to the problems when run by the harness, which can profile them.
+    import threading as sync
+
+
+class Pot(object):
+    """Like channel.go: the savage finding the pot empty sends on one channel and waits on another."""
+
+    def __init__(self, servings):
+        self.servings = servings
+        self.count = 0
+        self.closed = False
+        self.mutex = sync.Lock()
+        self.empty_pot = queue.Queue()
+        self.full_pot = queue.Queue()
+
+
+def cook(pot, times_cooked):
+    for _ in range(times_cooked):
+        pot.empty_pot.get()
+        pot.count = pot.servings
+        pot.full_pot.put(True)
+
+    # The next savage to find the pot empty learns there's no more food.
+    pot.empty_pot.get()
+    pot.closed = True
+    pot.full_pot.put(False)
+
+
+def savage(i, pot, meals, blocked):
+    while True:
+        with blocked[i]:
+            pot.mutex.acquire()
+            if pot.count == 0 and not pot.closed:
+                pot.empty_pot.put(True)
+                pot.full_pot.get()
+        if pot.count == 0:
+            pot.mutex.release()
+            return
+        pot.count -= 1
+        pot.mutex.release()
+
+        meals[i] += 1
+        # Eat.
+        time.sleep(0)
+
+
+def dine(n, servings, times_cooked):
+    pot = Pot(servings)
+    meals = [0] * n
+    blocked = [Blocked() for _ in range(n)]
+
+    threads = [sync.Thread(target = savage, args = (i, pot, meals, blocked)) for i in range(n)]
+    threads.append(sync.Thread(target = cook, args = (pot, times_cooked)))
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, meals, blocked
+
+
+if __name__ == "__main__":
+    # How many savages, and how many servings the pot holds.
+    ns, servings = get_sizes([5, 50, 500, 2000], 8)
+    meals_per_savage = 20
+
+    start = time.time()
+    for n in ns:
+        elapsed, meals, blocked = dine(n, servings, -(-n * meals_per_savage // servings))
+        report("channel", n, servings, elapsed, meals, blocked)
+    print(humanfriendly.format_timespan(time.time() - start))
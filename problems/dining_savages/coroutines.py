@@ -0,0 +1,66 @@
+import asyncio
+import time
+import humanfriendly
+
+from problem_metrics import rss
+
+
+class Pot(object):
+    """The book's dining savages: the savage finding the pot empty wakes the cook and waits for it."""
+
+    def __init__(self, servings):
+        self.servings = servings
+        self.count = 0
+        self.mutex = asyncio.Lock()
+        self.empty_pot = asyncio.Semaphore(0)
+        self.full_pot = asyncio.Semaphore(0)
+        self.meals = 0
+
+
+async def cook(pot, times_cooked):
+    for _ in range(times_cooked):
+        await pot.empty_pot.acquire()
+        pot.count = pot.servings
+        pot.full_pot.release()
+
+
+async def savage(pot, meals):
+    for _ in range(meals):
+        async with pot.mutex:
+            if pot.count == 0:
+                pot.empty_pot.release()
+                await pot.full_pot.acquire()
+            pot.count -= 1
+            pot.meals += 1
+        # Eat.
+        await asyncio.sleep(0)
+
+
+async def dine(num_savages, servings, meals):
+    """Starts the cook and every savage as tasks, returns the meals and the memory they took once parked."""
+    pot = Pot(servings)
+    times_cooked = -(-num_savages * meals // servings)
+
+    before = rss()
+    tasks = [asyncio.ensure_future(savage(pot, meals)) for _ in range(num_savages)]
+    tasks.append(asyncio.ensure_future(cook(pot, times_cooked)))
+    # Once they've all started and are parked, waiting on something.
+    await asyncio.sleep(0)
+    memory = rss() - before
+    await asyncio.gather(*tasks)
+    return pot.meals, memory
+
+
+if __name__ == "__main__":
+    num_savages = 10000
+    servings = 8
+    meals = 4
+
+    print("Feeding {0} savages".format(num_savages))
+    start = time.time()
+    eaten, memory = asyncio.get_event_loop().run_until_complete(dine(num_savages, servings, meals))
+    elapsed = time.time() - start
+
+    print("{0} meals, {1:.1f} meals/s".format(eaten, eaten / elapsed))
+    print("{0} per savage".format(humanfriendly.format_size(int(memory / num_savages))))
+    print(humanfriendly.format_timespan(elapsed))
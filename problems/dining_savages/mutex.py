@@ -0,0 +1,89 @@
+import time
+import humanfriendly
+
+from problem_metrics import Blocked, get_sizes, report
+
+try:
+    import sync_profile as sync
+except ImportError:
+    # Only next to the problems when run by the harness, which can profile them.
+    import threading as sync
+
+
+class Pot(object):
+    """Like mutex.go: savages take turns at the pot holding its mutex, and the one finding it empty
+    waits for the cook on a condition only the two of them share, instead of on semaphores.
+    """
+
+    def __init__(self, servings):
+        self.servings = servings
+        self.count = 0
+        self.closed = False
+        self.cooking = False
+        self.mutex = sync.Lock()
+        self.kitchen = sync.Condition()
+
+
+def cook(pot, times_cooked):
+    with pot.kitchen:
+        for _ in range(times_cooked):
+            while not pot.cooking:
+                pot.kitchen.wait()
+            pot.count = pot.servings
+            pot.cooking = False
+            pot.kitchen.notify()
+
+        # The next savage to find the pot empty learns there's no more food.
+        while not pot.cooking:
+            pot.kitchen.wait()
+        pot.closed = True
+        pot.cooking = False
+        pot.kitchen.notify()
+
+
+def savage(i, pot, meals, blocked):
+    while True:
+        with blocked[i]:
+            pot.mutex.acquire()
+            if pot.count == 0 and not pot.closed:
+                with pot.kitchen:
+                    pot.cooking = True
+                    pot.kitchen.notify()
+                    while pot.cooking:
+                        pot.kitchen.wait()
+        if pot.count == 0:
+            pot.mutex.release()
+            return
+        pot.count -= 1
+        pot.mutex.release()
+
+        meals[i] += 1
+        # Eat.
+        time.sleep(0)
+
+
+def dine(n, servings, times_cooked):
+    pot = Pot(servings)
+    meals = [0] * n
+    blocked = [Blocked() for _ in range(n)]
+
+    threads = [sync.Thread(target = savage, args = (i, pot, meals, blocked)) for i in range(n)]
+    threads.append(sync.Thread(target = cook, args = (pot, times_cooked)))
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, meals, blocked
+
+
+if __name__ == "__main__":
+    # How many savages, and how many servings the pot holds.
+    ns, servings = get_sizes([5, 50, 500, 2000], 8)
+    meals_per_savage = 20
+
+    start = time.time()
+    for n in ns:
+        elapsed, meals, blocked = dine(n, servings, -(-n * meals_per_savage // servings))
+        report("mutex", n, servings, elapsed, meals, blocked)
+    print(humanfriendly.format_timespan(time.time() - start))
@@ -0,0 +1,390 @@
+import collections
+import datetime
+import logging
+import math
+import os
+import shlex
+import shutil
+import subprocess
+import threading
+import time
+
+import docker
+from docker.errors import BuildError, APIError
+from docker.models.containers import Container
+
+from build_cache import BuildCache
+from manifest import get_toolchain
+from scheduler import available_cpus
+
+RunResult = collections.namedtuple("RunResult", ["exit_code", "elapsed", "stats", "logs"])
+
+# Resource limits for a run: how many cores' worth of CPU time it gets, and how much memory.
+Limits = collections.namedtuple("Limits", ["cpus", "memory"])
+
+
+class Executor(object):
+    """Somewhere to run the tests and the standard benchmark.
+
+    `run_with_stats` feeds the resource usage of the run to an aggregator as it goes, as
+    dicts shaped like the ones from the docker stats API, so the results look the same
+    whatever ran them.
+    """
+
+    def build(self, target, dockerfile):
+        """Gets a test ready to run, returns False if it can't be run."""
+        raise NotImplementedError()
+
+    def log_build_summary(self):
+        pass
+
+    def get_toolchain(self, target, dockerfile):
+        """What the test runs on, so that its results go stale when it changes."""
+        raise NotImplementedError()
+
+    def run(self, target, command, cpuset = None, limits = None):
+        """Runs a command to completion, returns its RunResult (without stats)."""
+        raise NotImplementedError()
+
+    def run_with_stats(self, target, command, aggregator, cpuset = None, limits = None):
+        """Runs a command to completion, returns its RunResult with the aggregator as its stats."""
+        raise NotImplementedError()
+
+
+class DockerExecutor(Executor):
+    """Builds an image per test, and runs every command in a fresh container."""
+
+    def __init__(self, build_cache = True, environment = None):
+        logging.info("Getting docker client")
+        self.client = docker.client.from_env()
+        self.cache = BuildCache(self.client, enabled = build_cache)
+        self.environment = environment or {}
+
+    def build(self, target, dockerfile):
+        try:
+            logging.info("Building test image: {0}".format(target.image_name))
+
+            self.cache.build(dockerfile, target.image_name)
+
+            logging.info("Built image: {0}".format(target.image_name))
+        except BuildError as e:
+            print(e)
+            return False
+        except APIError as e:
+            print(e)
+            exit(1)
+        return True
+
+    def log_build_summary(self):
+        self.cache.log_summary()
+
+    def get_toolchain(self, target, dockerfile):
+        return get_toolchain(dockerfile)
+
+    def _start(self, target, command, cpuset, environment = None, limits = None):
+        container_settings = {
+            "stdout": True,
+            "stderr": True,
+            "detach": True,
+            "tty": True
+        }
+        if cpuset is not None:
+            container_settings["cpuset_cpus"] = cpuset
+        if limits is not None and limits.cpus is not None:
+            container_settings["cpu_period"] = 100000
+            container_settings["cpu_quota"] = int(limits.cpus * 100000)
+        if limits is not None and limits.memory is not None:
+            # Without swap too, or going over the limit would just be slow.
+            container_settings["mem_limit"] = limits.memory
+            container_settings["memswap_limit"] = limits.memory
+        if environment:
+            container_settings["environment"] = environment
+
+        return self.client.containers.run(image = target.image_name,
+                                          command = 'sh -c "{0}"'.format(command),
+                                          **container_settings)
+
+    def run(self, target, command, cpuset = None, limits = None):
+        container: Container = self._start(target, command, cpuset, limits = limits)
+        start = time.time()
+        exit_code = container.wait()["StatusCode"]
+        end = time.time()
+        logs = container.logs() if exit_code != 0 else None
+        container.remove()
+        return RunResult(exit_code = exit_code, elapsed = end - start, stats = [], logs = logs)
+
+    def run_with_stats(self, target, command, aggregator, cpuset = None, limits = None):
+        container: Container = self._start(target, command, cpuset, self.environment, limits)
+        start = time.time()
+        stats = container.stats(decode=True)
+        for s in stats:
+            cpu_usage = s["cpu_stats"]["cpu_usage"]["total_usage"]
+            if cpu_usage == 0 and len(s["memory_stats"].keys()) == 0:
+                break
+            aggregator.add(s)
+
+        exit_code = container.wait()["StatusCode"]
+        end = time.time()
+        # Kept even if it passed, for anything the test reports (like its sync_profile).
+        logs = container.logs()
+        container.remove()
+        return RunResult(exit_code = exit_code, elapsed = end - start, stats = aggregator, logs = logs)
+
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+NS_PER_TICK = 1e9 / CLOCK_TICKS
+
+
+def _read_proc_stat(pid, tid = None):
+    """Returns (ppid, user ticks, kernel ticks, reaped children's user and kernel ticks, last cpu)
+    of a process (or just one of its threads), or None if it's gone.
+    """
+    path = "/proc/{0}/stat".format(pid) if tid is None else "/proc/{0}/task/{1}/stat".format(pid, tid)
+    try:
+        with open(path, "r") as f:
+            data = f.read()
+    except (IOError, OSError):
+        return None
+    # The command name can contain spaces, so split after its closing bracket.
+    fields = data[data.rindex(")") + 2:].split()
+    ppid = int(fields[1])
+    # utime, stime, cutime, cstime (the children's time is only counted once they've been reaped)
+    user, kernel = int(fields[11]), int(fields[12])
+    children_user, children_kernel = int(fields[13]), int(fields[14])
+    processor = int(fields[36])
+    return ppid, user, kernel, children_user, children_kernel, processor
+
+
+def _get_threads(pid):
+    try:
+        return os.listdir("/proc/{0}/task".format(pid))
+    except (IOError, OSError):
+        return []
+
+
+def _read_proc_memory(pid):
+    """Returns (resident, peak resident) bytes of a process."""
+    rss, hwm = 0, 0
+    try:
+        with open("/proc/{0}/status".format(pid), "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith("VmHWM:"):
+                    hwm = int(line.split()[1]) * 1024
+    except (IOError, OSError):
+        pass
+    return rss, hwm
+
+
+def _read_system_cpu_usage():
+    with open("/proc/stat", "r") as f:
+        cpu_line = f.readline()
+    return int(sum(map(int, cpu_line.split()[1:])) * NS_PER_TICK)
+
+
+def _get_process_tree(root_pid):
+    """The pid of the process and all its live descendants."""
+    children = collections.defaultdict(list)
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        stat = _read_proc_stat(entry)
+        if stat is not None:
+            children[stat[0]].append(int(entry))
+
+    tree = [root_pid]
+    for pid in tree:
+        tree.extend(children[pid])
+    return tree
+
+
+class ProcSampler(object):
+    """Samples the CPU and memory usage of a process tree from /proc, as docker stats dicts.
+
+    /proc has no per-core counters, so each thread's usage is charged to the core it last
+    ran on.  Reaped children's time only counts towards the totals, as it was already
+    charged to their cores while they were alive.
+    """
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.num_cpus = os.cpu_count() or 1
+        self.per_cpu = [0] * self.num_cpus
+        self.last_usage = {}
+        self.max_usage = 0
+        self.previous = {}
+
+    def sample(self):
+        user, kernel, rss = 0, 0, 0
+        for pid in _get_process_tree(self.pid):
+            stat = _read_proc_stat(pid)
+            if stat is None:
+                continue
+            _, p_user, p_kernel, children_user, children_kernel, processor = stat
+            user += p_user + children_user
+            kernel += p_kernel + children_kernel
+
+            for tid in _get_threads(pid):
+                thread_stat = _read_proc_stat(pid, tid)
+                if thread_stat is None:
+                    continue
+                _, t_user, t_kernel, _, _, t_processor = thread_stat
+                usage = t_user + t_kernel
+                self.per_cpu[t_processor % self.num_cpus] += usage - self.last_usage.get(tid, 0)
+                self.last_usage[tid] = usage
+
+            p_rss, p_hwm = _read_proc_memory(pid)
+            rss += p_rss
+            self.max_usage = max(self.max_usage, p_hwm)
+        self.max_usage = max(self.max_usage, rss)
+
+        cpu_stats = {
+            "cpu_usage": {
+                "total_usage": int((user + kernel) * NS_PER_TICK),
+                "usage_in_usermode": int(user * NS_PER_TICK),
+                "usage_in_kernelmode": int(kernel * NS_PER_TICK),
+                "percpu_usage": [int(ticks * NS_PER_TICK) for ticks in self.per_cpu],
+            },
+            "system_cpu_usage": _read_system_cpu_usage(),
+            "online_cpus": self.num_cpus,
+        }
+        stats = {
+            "read": datetime.datetime.utcnow().isoformat() + "Z",
+            "cpu_stats": cpu_stats,
+            "precpu_stats": self.previous,
+            "memory_stats": {
+                "usage": rss,
+                "max_usage": self.max_usage,
+                "stats": {"cache": 0},
+            },
+        }
+        self.previous = cpu_stats
+        return stats
+
+
+class LocalExecutor(Executor):
+    """Runs the tests as native processes, sampling their usage from /proc.
+
+    Tests run from their own directory with the toolchains on the PATH, so any
+    requirements.txt (or requirements_<lang>.txt) has to already be installed.  The
+    standard benchmark is built once, and stands in for the ./app built into the
+    docker images.
+
+    There's no CPU quota without a container, so a CPU limit pins the run to that
+    many whole cores instead.  Nor is there a limit on resident memory (rlimits only cap
+    address space, which every thread stack reserves plenty of), so memory limits need
+    the docker executor.
+    """
+
+    BASELINE = "images/baseline"
+
+    def __init__(self, stats_interval = 1.0, environment = None):
+        self.stats_interval = stats_interval
+        self.environment = environment or {}
+        self.baseline = None
+
+    def _get_baseline(self):
+        if self.baseline is None:
+            if not os.path.exists("images"):
+                os.mkdir("images")
+            logging.info("Building standard benchmark: {0}".format(self.BASELINE))
+            subprocess.check_call(["go", "build", "-o", self.BASELINE, "baseline.go"])
+            self.baseline = os.path.abspath(self.BASELINE)
+        return self.baseline
+
+    def _get_command(self, command):
+        if command == "./app":
+            return [self._get_baseline()]
+        return shlex.split(command)
+
+    def get_toolchain(self, target, dockerfile):
+        executable = shlex.split(target.entry_command)[0]
+        version_command = [executable, "version"] if executable == "go" else [executable, "--version"]
+        try:
+            output = subprocess.check_output(version_command, stderr = subprocess.STDOUT)
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        return output.decode("utf-8", "replace").strip().splitlines()[0]
+
+    def build(self, target, dockerfile):
+        executable = shlex.split(target.entry_command)[0]
+        if shutil.which(executable) is None:
+            logging.warning("{0} not found, skipping: {1}".format(executable, target.image_name))
+            return False
+        self._get_baseline()
+        return True
+
+    def _start(self, target, command, cpuset, environment = None, limits = None):
+        if limits is not None and limits.cpus is not None and cpuset is None:
+            cpuset = ",".join(map(str, available_cpus()[:int(math.ceil(limits.cpus))]))
+
+        if limits is not None and limits.memory is not None:
+            raise ValueError("Memory limits need the docker executor: " + str(limits.memory))
+
+        env = dict(os.environ)
+        env.update(environment or {})
+        # Python tests find the harness' shared modules here, like in their images.
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.abspath("."), env.get("PYTHONPATH")]))
+
+        process = subprocess.Popen(self._get_command(command),
+                                   cwd = target.test,
+                                   env = env,
+                                   stdout = subprocess.PIPE,
+                                   stderr = subprocess.STDOUT)
+        if cpuset is not None:
+            # Anything it starts from here on inherits the affinity.
+            os.sched_setaffinity(process.pid, map(int, cpuset.split(",")))
+        return process
+
+    def run(self, target, command, cpuset = None, limits = None):
+        start = time.time()
+        process = self._start(target, command, cpuset, limits = limits)
+        output, _ = process.communicate()
+        end = time.time()
+        logs = output if process.returncode != 0 else None
+        return RunResult(exit_code = process.returncode, elapsed = end - start, stats = [], logs = logs)
+
+    def run_with_stats(self, target, command, aggregator, cpuset = None, limits = None):
+        start = time.time()
+        process = self._start(target, command, cpuset, self.environment, limits)
+        sampler = ProcSampler(process.pid)
+
+        # Drain the output on the side, so a chatty test can't block on a full pipe.
+        output = []
+        reader = threading.Thread(target = lambda: output.append(process.stdout.read()), daemon = True)
+        reader.start()
+
+        # Reaped with wait4 for its rusage, which has the real totals even if it ended before
+        # the first sample.
+        waited = []
+        waiter = threading.Thread(target = lambda: waited.append(os.wait4(process.pid, 0)), daemon = True)
+        waiter.start()
+        while True:
+            waiter.join(self.stats_interval)
+            if not waiter.is_alive():
+                break
+            aggregator.add(sampler.sample())
+        end = time.time()
+
+        _, status, rusage = waited[0]
+        process.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+        aggregator.add_totals(user_cpu_time = int(rusage.ru_utime * 1e9),
+                              kernel_cpu_time = int(rusage.ru_stime * 1e9),
+                              # In kilobytes, of the largest process in the tree.
+                              max_memory_usage = rusage.ru_maxrss * 1024)
+
+        reader.join()
+        # Kept even if it passed, for anything the test reports (like its sync_profile).
+        logs = b"".join(output)
+        return RunResult(exit_code = process.returncode, elapsed = end - start, stats = aggregator, logs = logs)
+
+
+def get_executor(configs):
+    # Only the tests themselves are profiled, not the standard benchmark.
+    environment = {"SYNC_PROFILE": "1"} if configs.sync_profile else {}
+    if configs.executor == "docker":
+        return DockerExecutor(build_cache = configs.build_cache, environment = environment)
+    elif configs.executor == "local":
+        return LocalExecutor(stats_interval = configs.stats_interval, environment = environment)
+    raise ValueError("Unknown executor: " + configs.executor)
@@ -0,0 +1,70 @@
+import json
+import logging
+import os
+
+
+def get_toolchain(dockerfile):
+    """The image the test runs in, which is the last stage of its Dockerfile."""
+    toolchain = None
+    with open(dockerfile, "r") as f:
+        for line in f:
+            if line.startswith("FROM "):
+                toolchain = line.split()[1]
+    return toolchain
+
+
+class ResultManifest(object):
+    """Keeps track of which samples of which tests already have results.
+
+    Each test (problem, language, file) records the hash of its sources, the toolchain
+    it ran on, how many samples were asked for and which sample ids have been written.
+    A test only has to run the samples it's missing (or none, if its results were
+    already conclusive), unless its sources or toolchain changed since, in which case
+    all of its results are stale.
+    """
+
+    def __init__(self, path = "results/manifest.json"):
+        self.path = path
+        self.tests = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.tests = json.load(f)
+
+    def get_missing_samples(self, key, source_hash, toolchain, sample_size):
+        """Returns (samples to run, whether the existing results are stale)."""
+        entry = self.tests.get(key)
+        if entry is None:
+            return list(range(sample_size)), True
+
+        if entry["source_hash"] != source_hash or entry["toolchain"] != toolchain:
+            logging.info("Results are stale: {0}".format(key))
+            return list(range(sample_size)), True
+
+        if entry.get("converged", False):
+            return [], False
+
+        completed = set(entry["completed"])
+        return [i for i in range(sample_size) if i not in completed], False
+
+    def record(self, key, source_hash, toolchain, sample_size, iterations, stale, converged = False):
+        entry = self.tests.get(key)
+        if stale or entry is None:
+            entry = {"completed": []}
+
+        entry["source_hash"] = source_hash
+        entry["toolchain"] = toolchain
+        entry["sample_size"] = max(sample_size, entry.get("sample_size", 0))
+        entry["completed"] = sorted(set(entry["completed"]) | set(iterations))
+        entry["converged"] = converged
+        self.tests[key] = entry
+        self.save()
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory != "" and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        # Write to the side first, so a crash can't leave a half-written manifest.
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(self.tests, f, indent = 2, sort_keys = True)
+        os.replace(self.path + ".tmp", self.path)
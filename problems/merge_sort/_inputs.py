@@ -0,0 +1,35 @@
+import random
+from collections import OrderedDict
+
+
+def sorted_input(size, seed = 0):
+    return list(range(1, size + 1))
+
+
+def reversed_input(size, seed = 0):
+    return list(range(size, 0, -1))
+
+
+def random_input(size, seed = 0):
+    lst = sorted_input(size)
+    random.Random(seed).shuffle(lst)
+    return lst
+
+
+def nearly_sorted_input(size, seed = 0, swaps = 0.01):
+    """Sorted, apart from a fraction of items swapped with a random other item."""
+    lst = sorted_input(size)
+    rng = random.Random(seed)
+    for _ in range(int(size * swaps)):
+        i, j = rng.randrange(size), rng.randrange(size)
+        lst[i], lst[j] = lst[j], lst[i]
+    return lst
+
+
+# The input distributions the sorts are benchmarked against, by name.
+INPUTS = OrderedDict([
+    ("sorted", sorted_input),
+    ("reversed", reversed_input),
+    ("random", random_input),
+    ("nearly_sorted", nearly_sorted_input),
+])
@@ -0,0 +1,65 @@
+import itertools
+
+# Marks an exhausted side of a merge, unlike None it can't be one of the items.
+_EXHAUSTED = object()
+
+
+def merge(left, right, reverse = False):
+    """Lazily merges two sorted iterators of (key, item) pairs, stably.
+
+    An item from the right is only taken when its key strictly comes first, so equal keys
+    keep their original order (also when reversed).
+    """
+    current_left = next(left, _EXHAUSTED)
+    current_right = next(right, _EXHAUSTED)
+
+    while current_left is not _EXHAUSTED and current_right is not _EXHAUSTED:
+        if (current_left[0] < current_right[0]) if reverse else (current_right[0] < current_left[0]):
+            yield current_right
+            current_right = next(right, _EXHAUSTED)
+        else:
+            yield current_left
+            current_left = next(left, _EXHAUSTED)
+
+    if current_left is not _EXHAUSTED:
+        yield current_left
+        yield from left
+    if current_right is not _EXHAUSTED:
+        yield current_right
+        yield from right
+
+
+def _merge_sort(pairs, start, end, reverse):
+    if end - start <= 1:
+        return iter(pairs[start:end])
+
+    half = (start + end) // 2
+    return merge(_merge_sort(pairs, start, half, reverse), _merge_sort(pairs, half, end, reverse), reverse)
+
+
+def batched(iterable, batch_size):
+    """Yields the items of an iterable as lists of (at most) batch_size items."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if len(batch) == 0:
+            return
+        yield batch
+
+
+def lazy_sort(iterable, key = None, reverse = False, batch_size = None):
+    """A stable merge sort of any iterable, yielding its items in order as they're merged.
+
+    Like sorted(), but lazy: taking the first few items only does the merges they need.  With
+    batch_size, lists of that many items are yielded instead, so pipelines consuming the output
+    don't pay for a generator step per item.
+    """
+    items = list(iterable)
+    keys = items if key is None else [key(item) for item in items]
+    # Keys are computed once, and compared without ever comparing the items themselves.
+    pairs = list(zip(keys, items))
+
+    ordered = (item for _, item in _merge_sort(pairs, 0, len(pairs), reverse))
+    if batch_size is not None:
+        return batched(ordered, batch_size)
+    return ordered
@@ -0,0 +1,62 @@
+import heapq
+import itertools
+import mmap
+import tempfile
+import time
+from array import array
+import humanfriendly
+
+
+def get_runs(iterable, run_size):
+    """Yields the items of an iterable as sorted lists of (at most) run_size items."""
+    iterator = iter(iterable)
+    while True:
+        run = list(itertools.islice(iterator, run_size))
+        if len(run) == 0:
+            return
+        run.sort()
+        yield run
+
+
+def spill_run(run, typecode):
+    """Writes a sorted run to an anonymous temp file, returns it memory mapped."""
+    with tempfile.TemporaryFile() as f:
+        array(typecode, run).tofile(f)
+        f.flush()
+        # The mapping stays valid after the file is closed (and deleted).
+        return mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+
+
+def read_run(mapped, typecode):
+    """Yields the items of a spilled run, releasing its mapping once done."""
+    view = memoryview(mapped).cast(typecode)
+    try:
+        yield from view
+    finally:
+        view.release()
+        mapped.close()
+
+
+def external_sort(iterable, run_size = 1000000, spill = False, typecode = "q"):
+    """Streaming merge sort: sorts fixed size runs, then lazily merges them all with a single heap.
+
+    Each item costs O(log k) for k runs, instead of being re-yielded through every level of a
+    tree of generators.  With spill, the runs are kept in memory mapped temp files (as typecode
+    items) rather than lists, so inputs larger than memory can be sorted.
+    """
+    runs = get_runs(iterable, run_size)
+    if spill:
+        runs = [read_run(spill_run(run, typecode), typecode) for run in runs]
+    else:
+        runs = list(runs)
+
+    return heapq.merge(*runs)
+
+
+if __name__ == "__main__":
+    lst = list(range(1, 8000000 + 1))
+    print("Staring merge")
+    start = time.time()
+    x = external_sort(list(lst), spill = True)
+    list(x)
+    print(humanfriendly.format_timespan(time.time() - start))
@@ -0,0 +1,66 @@
+import time
+from array import array
+import humanfriendly
+
+
+def merge_ranges(src, dst, lo, mid, hi):
+    """Merges the sorted ranges src[lo:mid] and src[mid:hi] into dst[lo:hi]."""
+    if mid >= hi or src[mid - 1] <= src[mid]:
+        # Already in order (or nothing to merge with), just copy it across.
+        dst[lo:hi] = src[lo:hi]
+        return
+
+    i, j, k = lo, mid, lo
+    while i < mid and j < hi:
+        if src[j] < src[i]:
+            dst[k] = src[j]
+            j += 1
+        else:
+            # Taking from the left on ties keeps the sort stable.
+            dst[k] = src[i]
+            i += 1
+        k += 1
+
+    if i < mid:
+        dst[k:hi] = src[i:mid]
+    else:
+        dst[k:hi] = src[j:hi]
+
+
+def bottom_up_merge_sort(seq):
+    """Sorts a list (or typed array) in place, without recursion or copying at every level.
+
+    Runs of width 1, 2, 4, ... are merged back and forth between the sequence and a single
+    auxiliary buffer of the same size, so at most ~2n elements are alive at once.
+    """
+    n = len(seq)
+    if n <= 1:
+        return seq
+
+    buffer = array(seq.typecode, seq) if isinstance(seq, array) else list(seq)
+    src, dst = seq, buffer
+    width = 1
+    while width < n:
+        for lo in range(0, n, 2 * width):
+            merge_ranges(src, dst, lo, min(lo + width, n), min(lo + 2 * width, n))
+        src, dst = dst, src
+        width *= 2
+
+    if src is not seq:
+        seq[:] = src
+    return seq
+
+
+if __name__ == "__main__":
+    lst = list(range(1, 8000000 + 1))
+    print("Staring merge")
+    start = time.time()
+    bottom_up_merge_sort(lst)
+    print(humanfriendly.format_timespan(time.time() - start))
+
+    typed = array("q", lst)
+    del lst
+    print("Staring merge (array('q'))")
+    start = time.time()
+    bottom_up_merge_sort(typed)
+    print(humanfriendly.format_timespan(time.time() - start))
@@ -0,0 +1,64 @@
+import heapq
+import os
+import time
+from multiprocessing import Pool, RawArray
+import humanfriendly
+
+from recursive import merge_sort_rec
+
+# The array being sorted, shared with (not pickled to) the workers.
+shared_array = None
+
+
+def _init_worker(array):
+    global shared_array
+    shared_array = array
+
+
+def _sort_chunk(bounds):
+    """Merge sorts one chunk of the shared array in place."""
+    start, end = bounds
+    shared_array[start:end] = merge_sort_rec(shared_array[start:end])
+    return bounds
+
+
+def get_chunks(length, num_chunks):
+    """Splits [0, length) into num_chunks contiguous (start, end) ranges."""
+    num_chunks = max(1, min(num_chunks, length))
+    size, remainder = divmod(length, num_chunks)
+    chunks = []
+    start = 0
+    for i in range(num_chunks):
+        end = start + size + (1 if i < remainder else 0)
+        chunks.append((start, end))
+        start = end
+    return chunks
+
+
+def parallel_merge_sort(array, processes = None, typecode = "q"):
+    """Merge sort across a pool of processes.
+
+    The input is copied once into a shared buffer, each worker sorts its own chunk of it
+    in place (only the chunk bounds are sent to them), and the sorted chunks are then
+    combined with a single k-way merge.
+    """
+    if processes is None:
+        # Only the cores the container or cpuset lets us run on.
+        processes = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    shared = RawArray(typecode, array)
+    chunks = get_chunks(len(array), processes)
+
+    with Pool(processes = processes, initializer = _init_worker, initargs = (shared,)) as pool:
+        pool.map(_sort_chunk, chunks)
+
+    view = memoryview(shared).cast("B").cast(typecode)
+    return list(heapq.merge(*[view[start:end] for start, end in chunks]))
+
+
+if __name__ == "__main__":
+    lst = list(range(1, 8000000 + 1))
+    print("Staring merge")
+    start = time.time()
+    x = parallel_merge_sort(list(lst))
+    list(x)
+    print(humanfriendly.format_timespan(time.time() - start))
@@ -1,19 +1,65 @@
 import time
+from bisect import bisect_left, bisect_right
 import humanfriendly
 
+from _inputs import INPUTS
+
+# Lists this short are insertion sorted rather than split any further.
+INSERTION_CUTOFF = 32
+# How many items in a row one side of a merge has to win before galloping through it.
+MIN_GALLOP = 7
+
+
+def insertion_sort(array):
+    """Binary insertion sort, in place (stable, as items go after any equal ones)."""
+    for i in range(1, len(array)):
+        item = array[i]
+        position = bisect_right(array, item, 0, i)
+        array[position + 1:i + 1] = array[position:i]
+        array[position] = item
+    return array
+
+
+def gallop(array, value, start, strict):
+    """End of the run of array[start:] that comes before value (equal items too, unless strict).
+
+    Probes start, start + 1, start + 3, start + 7, ... then binary searches the last gap, so a
+    run of k items costs O(log k) comparisons.
+    """
+    low, high, step = start, start, 1
+    while high < len(array) and (array[high] < value if strict else array[high] <= value):
+        low = high + 1
+        high = start + step * 2 - 1
+        step *= 2
+
+    search = bisect_left if strict else bisect_right
+    return search(array, value, low, min(high, len(array)))
+
 
 def merge_rec(left, right):
     """Merge sort merging function."""
 
     left_index, right_index = 0, 0
+    left_wins, right_wins = 0, 0
     result = []
     while left_index < len(left) and right_index < len(right):
-        if left[left_index] < right[right_index]:
-            result.append(left[left_index])
-            left_index += 1
-        else:
+        if right[right_index] < left[left_index]:
             result.append(right[right_index])
             right_index += 1
+            right_wins, left_wins = right_wins + 1, 0
+            if right_wins >= MIN_GALLOP and right_index < len(right):
+                end = gallop(right, left[left_index], right_index, strict = True)
+                result += right[right_index:end]
+                right_index, right_wins = end, 0
+        else:
+            # Taking from the left on ties keeps the sort stable.
+            result.append(left[left_index])
+            left_index += 1
+            left_wins, right_wins = left_wins + 1, 0
+            if left_wins >= MIN_GALLOP and left_index < len(left):
+                end = gallop(left, right[right_index], left_index, strict = False)
+                result += left[left_index:end]
+                left_index, left_wins = end, 0
 
     result += left[left_index:]
     result += right[right_index:]
@@ -23,22 +69,27 @@ def merge_rec(left, right):
 def merge_sort_rec(array):
     """Merge sort algorithm implementation."""
 
-    if len(array) <= 1:  # base case
-        return array
+    if len(array) <= INSERTION_CUTOFF:  # base case
+        return insertion_sort(list(array))
 
     # divide array in half and merge sort recursively
     half = len(array) // 2
     left = merge_sort_rec(array[:half])
     right = merge_sort_rec(array[half:])
 
+    # the halves are already in order, nothing to merge
+    if not right[0] < left[-1]:
+        return left + right
+
     return merge_rec(left, right)
 
 
 
 if __name__ == "__main__":
-    lst = list(range(1, 8000000 + 1))
-    print("Staring merge")
-    start = time.time()
-    x = merge_sort_rec(list(lst))
-    list(x)
-    print(humanfriendly.format_timespan(time.time() - start))
\ No newline at end of file
+    for name, get_input in INPUTS.items():
+        lst = get_input(8000000)
+        print("Staring merge ({0})".format(name))
+        start = time.time()
+        x = merge_sort_rec(list(lst))
+        list(x)
+        print(humanfriendly.format_timespan(time.time() - start))
@@ -1,36 +1,11 @@
 import time
 import humanfriendly
 
+from _lazy_sort import lazy_sort
 
-def merge_sort(lis):
-    if len(lis) <= 1:
-        yield from lis
-    else:
-        over = len(lis) // 2
-        RL = merge_sort(lis[over:])
-        LL = merge_sort(lis[:over])
-        cRL = next(RL)
-        cLL = next(LL)
 
-        while True:
-            if cRL is not None and cLL is not None and cRL <= cLL:
-                try:
-                    yield cRL
-                    cRL = next(RL)
-                except StopIteration:
-                    cRL = None
-            elif cLL is not None:
-                try:
-                    yield cLL
-                    cLL = next(LL)
-                except StopIteration:
-                    cLL = None
-            elif cRL is not None:
-                yield cRL
-                cRL = next(RL)
-            else:
-                yield cLL
-                cLL = next(LL)
+def merge_sort(lis):
+    return lazy_sort(lis)
 
 if __name__ == "__main__":
     lst = list(range(1, 8000 + 1))
@@ -0,0 +1,135 @@
+import collections
+import hashlib
+import json
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+# Figures are only ever saved, and the interactive backends don't work in worker processes.
+matplotlib.use("Agg")
+from matplotlib import pyplot as plt
+import pandas as pd
+
+from results_store import LABELS
+
+FIGURES = "results/figures"
+HASHES = os.path.join(FIGURES, "hashes.json")
+
+# One of these per table of a test, rendered to a figure per column (and maybe a combined one).
+FigureJob = collections.namedtuple("FigureJob", ["name", "directory", "x_label", "df", "combined"])
+
+
+def _get_columns(df, x_column):
+    return [column for column in df.columns
+            if column not in [x_column, "outlier"] and column not in LABELS and df[column].notnull().any()]
+
+
+def _table_hash(job):
+    digest = hashlib.sha256()
+    digest.update(json.dumps([job.name, job.x_label, job.combined]).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(job.df, index = True).values.tobytes())
+    digest.update(",".join(map(str, job.df.columns)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def render_figures(job):
+    """Renders a figure per column of a table, plus one with every column if asked for."""
+    x_column = "time_recorded" if job.x_label == "sample" else "iteration"
+    columns = _get_columns(job.df, x_column)
+
+    for column in columns:
+        plot_output = os.path.join(FIGURES, job.directory, job.name + "_" + column + ".png")
+
+        plt.plot(job.df.index, job.df[column])
+        plt.xlabel(job.x_label)
+        plt.ylabel(column)
+        plt.title(job.name + "_" + column)
+        plt.grid(True)
+        plt.savefig(plot_output)
+        plt.close()
+
+    if job.combined and len(columns) > 0:
+        width = int(math.ceil(math.sqrt(len(columns))))
+        height = int(math.ceil(len(columns) / float(width)))
+        figure, axes = plt.subplots(height, width, figsize = (4 * width, 3 * height), squeeze = False)
+        for ax, column in zip(axes.flat, columns):
+            ax.plot(job.df.index, job.df[column])
+            ax.set_xlabel(job.x_label)
+            ax.set_title(column, fontsize = "small")
+            ax.grid(True)
+        for ax in axes.flat[len(columns):]:
+            ax.axis("off")
+        figure.suptitle(job.name)
+        figure.tight_layout()
+        figure.savefig(os.path.join(FIGURES, "combined", job.name + ".png"))
+        plt.close(figure)
+
+    return len(columns)
+
+
+def get_figure_jobs(store, combined = False):
+    """A FigureJob for the latest first run and the current samples of every test in the store."""
+    keys = ["problem", "runtime", "file"]
+
+    first_run = store.load_current("first_run")
+    if len(first_run) > 0:
+        for (problem, runtime, file), df in first_run.groupby(keys):
+            # Only plot the latest first run.
+            df = df[df["run_id"] == df["run_id"].iloc[-1]].reset_index(drop = True)
+            yield FigureJob(name = "_".join([problem, "first", runtime, file]),
+                            directory = "first",
+                            x_label = "sample",
+                            df = df,
+                            combined = combined)
+
+    samples = store.load_current("samples")
+    if len(samples) > 0:
+        for (problem, runtime, file), df in samples.groupby(keys):
+            yield FigureJob(name = "_".join([problem, "samples", runtime, file]),
+                            directory = "overall",
+                            x_label = "iteration",
+                            df = df.reset_index(drop = True),
+                            combined = combined)
+
+
+def plot_results(store, workers = 0, combined = False, force = False):
+    """Renders the figures of every test whose results changed since they were last rendered."""
+    for directory in ["first", "overall", "combined"]:
+        if not os.path.exists(os.path.join(FIGURES, directory)):
+            os.makedirs(os.path.join(FIGURES, directory))
+
+    hashes = {}
+    if os.path.exists(HASHES) and not force:
+        with open(HASHES, "r") as f:
+            hashes = json.load(f)
+
+    jobs, unchanged = [], 0
+    for job in get_figure_jobs(store, combined):
+        table_hash = _table_hash(job)
+        if hashes.get(job.name) == table_hash:
+            unchanged += 1
+            continue
+        hashes[job.name] = table_hash
+        jobs.append(job)
+
+    logging.info("Rendering figures of {0} tables ({1} unchanged)".format(len(jobs), unchanged))
+    if len(jobs) == 0:
+        return
+
+    with ProcessPoolExecutor(max_workers = workers if workers > 0 else None) as pool:
+        rendered = sum(pool.map(render_figures, jobs))
+    logging.info("Rendered {0} figures".format(rendered))
+
+    with open(HASHES, "w") as f:
+        json.dump(hashes, f, indent = 2, sort_keys = True)
+
+
+if __name__ == "__main__":
+    from results_store import ResultStore
+    from testing import get_args, _configure_logging
+
+    _configure_logging()
+    configs = get_args()
+    plot_results(ResultStore(), configs.plot_workers, configs.combined_figures, configs.force_plots)
@@ -0,0 +1,145 @@
+"""Bounded buffers for threads and processes, built from the book's semaphores.
+
+Shared by the queue and producer-consumer problems, and shipped next to them by the harness.
+"""
+import collections
+import contextlib
+import queue
+from multiprocessing import Lock, RawArray, RawValue, Semaphore
+
+try:
+    import sync_profile as sync
+except ImportError:
+    # Only next to the problems when run by the harness, which can profile them.
+    import threading as sync
+
+
+class BoundedQueue(object):
+    """A bounded multi producer, multi consumer queue for threads, from the book's semaphores.
+
+    `spaces` counts the free slots and `items` the filled ones, so producers block while it's
+    full and consumers while it's empty.  The book guards the buffer with a mutex too, but
+    deque's append and popleft are already atomic, so producers and consumers never contend
+    on anything but the semaphores.
+    """
+
+    def __init__(self, capacity):
+        self.items = sync.Semaphore(0)
+        self.spaces = sync.Semaphore(capacity)
+        self.buffer = collections.deque()
+
+    def put(self, item, timeout = None):
+        if not self.spaces.acquire(timeout = timeout):
+            raise queue.Full
+        self.buffer.append(item)
+        self.items.release()
+
+    def get(self, timeout = None):
+        if not self.items.acquire(timeout = timeout):
+            raise queue.Empty
+        item = self.buffer.popleft()
+        self.spaces.release()
+        return item
+
+
+class SharedRingBuffer(object):
+    """A bounded multi producer, multi consumer queue between processes, over shared memory.
+
+    Items (of a single typecode) live in a fixed ring of a RawArray, so nothing is pickled or
+    sent over a pipe.  The same two semaphores track the slots, and producers and consumers
+    each have their own lock to claim the next slot, so they never contend with each other.
+    """
+
+    def __init__(self, capacity, typecode = "d"):
+        self.capacity = capacity
+        self.buffer = RawArray(typecode, capacity)
+        # The next slot to read from, and to write to.
+        self.head = RawValue("q", 0)
+        self.tail = RawValue("q", 0)
+        self.items = Semaphore(0)
+        self.spaces = Semaphore(capacity)
+        self.put_lock = Lock()
+        self.get_lock = Lock()
+
+    def put(self, item, timeout = None):
+        if not self.spaces.acquire(timeout = timeout):
+            raise queue.Full
+        with self.put_lock:
+            self.buffer[self.tail.value] = item
+            self.tail.value = (self.tail.value + 1) % self.capacity
+        self.items.release()
+
+    def get(self, timeout = None):
+        if not self.items.acquire(timeout = timeout):
+            raise queue.Empty
+        with self.get_lock:
+            item = self.buffer[self.head.value]
+            self.head.value = (self.head.value + 1) % self.capacity
+        self.spaces.release()
+        return item
+
+
+class SharedRing(object):
+    """A single producer, single consumer ring of fixed size slots in shared memory, for processes.
+
+    A payload is copied straight into its slot through a memoryview (nothing is pickled or sent
+    down a pipe), and the consumer reads it in place: `get` hands out a memoryview of the slot,
+    which is only given back to the producer once the consumer is done with it.
+
+    Unlike SharedRingBuffer, whose slots hold one number each and are copied out under a lock,
+    a slot here holds a variable length payload that is still being read after `get` returns.
+    With one producer and one consumer, each end keeps its own index in its own process and
+    needs no lock at all.
+    """
+
+    def __init__(self, num_slots, slot_size):
+        self.num_slots = num_slots
+        self.slot_size = slot_size
+        self.data = RawArray("B", num_slots * slot_size)
+        # How much of each slot is used, -1 to tell the consumer to stop.
+        self.lengths = RawArray("q", num_slots)
+        self.items = Semaphore(0)
+        self.spaces = Semaphore(num_slots)
+        # Only ever touched by the producer, and the consumer, respectively.
+        self.head = 0
+        self.tail = 0
+        self._view = None
+
+    @property
+    def view(self):
+        # Made lazily, since memoryviews can't be sent to another process.
+        if self._view is None:
+            self._view = memoryview(self.data).cast("B")
+        return self._view
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_view"] = None
+        return state
+
+    def put(self, payload):
+        self.spaces.acquire()
+        offset = self.tail * self.slot_size
+        self.view[offset:offset + len(payload)] = payload
+        self.lengths[self.tail] = len(payload)
+        self.tail = (self.tail + 1) % self.num_slots
+        self.items.release()
+
+    def close(self):
+        """Tells the consumer there's nothing more to come."""
+        self.spaces.acquire()
+        self.lengths[self.tail] = -1
+        self.tail = (self.tail + 1) % self.num_slots
+        self.items.release()
+
+    @contextlib.contextmanager
+    def get(self):
+        """The next payload (as a memoryview of its slot), or None once closed."""
+        self.items.acquire()
+        length = self.lengths[self.head]
+        offset = self.head * self.slot_size
+        try:
+            yield self.view[offset:offset + length] if length >= 0 else None
+        finally:
+            self.head = (self.head + 1) % self.num_slots
+            self.spaces.release()
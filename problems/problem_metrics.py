@@ -0,0 +1,56 @@
+"""Measurements the Python problems share, shipped next to them by the harness like sync_profile.
+
+Run a problem on its own with this directory on the PYTHONPATH, e.g. from the problem's
+directory: PYTHONPATH=.. python3 coroutines.py
+"""
+import os
+import sys
+import time
+
+
+def rss():
+    """Resident memory of this process, in bytes."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def jains_index(values):
+    """Jain's fairness index, from 1/n (one agent gets everything) to 1 (everyone gets the same)."""
+    total = sum(values)
+    squares = sum(value * value for value in values)
+    if squares == 0:
+        return 1.0
+    return total * total / (len(values) * squares)
+
+
+def get_sizes(default_ns, default_m):
+    """The numbers of agents to run with, and M, either from the command line (N [M]) or the defaults.
+
+    M is parsed as whatever type its default is.
+    """
+    ns = [int(sys.argv[1])] if len(sys.argv) > 1 else default_ns
+    m = type(default_m)(sys.argv[2]) if len(sys.argv) > 2 else default_m
+    return ns, m
+
+
+class Blocked(object):
+    """Times how long an agent spends blocked, e.g. `with blocked: fork.acquire()`."""
+
+    def __init__(self):
+        self.total = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.total += time.perf_counter() - self.start
+
+
+def report(name, n, m, elapsed, meals, blocked, m_name = "M"):
+    """Prints the throughput, and how fairly the meals and time blocked were spread across agents."""
+    blocked_times = [b.total for b in blocked]
+    print("{0} N={1} {10}={2}: {3:.1f} meals/s, meals per agent {4}..{5} (fairness {6:.3f}), "
+          "blocked mean {7:.6f}s max {8:.6f}s (fairness {9:.3f})".format(
+              name, n, m, sum(meals) / elapsed, min(meals), max(meals), jains_index(meals),
+              sum(blocked_times) / n, max(blocked_times), jains_index(blocked_times), m_name))
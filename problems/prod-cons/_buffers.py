@@ -0,0 +1,19 @@
+# Payloads from 8 bytes to 1MB.
+PAYLOAD_SIZES = [8, 64, 512, 4096, 32768, 262144, 1048576]
+# About how many bytes to send through for every payload size.
+TOTAL_BYTES = 64 * 1024 * 1024
+
+
+def get_num_messages(payload_size):
+    return max(100, min(50000, TOTAL_BYTES // payload_size))
+
+
+def print_result(name, payload_size, num_messages, elapsed, copied = True):
+    """Prints a row of the results.  Buffers that pass references rather than `copied` payloads have no MB/s."""
+    throughput = "{0:.1f}".format(num_messages * payload_size / elapsed / 1e6) if copied else "-"
+    print("{0:>22} {1:>9} {2:>8} {3:>12.1f} {4:>10}".format(
+        name, payload_size, num_messages, num_messages / elapsed, throughput))
+
+
+def print_header():
+    print("{0:>22} {1:>9} {2:>8} {3:>12} {4:>10}".format("buffer", "payload", "messages", "msgs/s", "MB/s"))
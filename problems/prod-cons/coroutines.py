@@ -0,0 +1,54 @@
+import asyncio
+import time
+import humanfriendly
+
+from problem_metrics import rss
+
+
+async def producer(buffer, num_items):
+    for i in range(num_items):
+        await buffer.put(i)
+
+
+async def consumer(buffer, consumed):
+    while True:
+        item = await buffer.get()
+        if item is None:
+            return
+        consumed.append(item)
+
+
+async def produce_consume(num_producers, num_consumers, items_per_producer, buffer_size):
+    """Runs every producer and consumer as a task, returns the items consumed and the memory they took once parked."""
+    buffer = asyncio.Queue(maxsize = buffer_size)
+    consumed = []
+
+    before = rss()
+    producers = [asyncio.ensure_future(producer(buffer, items_per_producer)) for _ in range(num_producers)]
+    consumers = [asyncio.ensure_future(consumer(buffer, consumed)) for _ in range(num_consumers)]
+    # Once they've all started and are parked, waiting on something.
+    await asyncio.sleep(0)
+    memory = rss() - before
+
+    await asyncio.gather(*producers)
+    for _ in consumers:
+        await buffer.put(None)
+    await asyncio.gather(*consumers)
+    return len(consumed), memory
+
+
+if __name__ == "__main__":
+    num_producers = 10000
+    num_consumers = 10000
+    items_per_producer = 10
+    buffer_size = 100
+
+    print("Starting {0} producers and {1} consumers".format(num_producers, num_consumers))
+    start = time.time()
+    consumed, memory = asyncio.get_event_loop().run_until_complete(
+        produce_consume(num_producers, num_consumers, items_per_producer, buffer_size))
+    elapsed = time.time() - start
+
+    print("{0} items, {1:.1f} items/s".format(consumed, consumed / elapsed))
+    print("{0} per task".format(humanfriendly.format_size(int(memory / (num_producers + num_consumers)))))
+    print(humanfriendly.format_timespan(elapsed))
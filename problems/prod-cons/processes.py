@@ -0,0 +1,64 @@
+import multiprocessing
+import time
+import humanfriendly
+
+from _buffers import PAYLOAD_SIZES, get_num_messages, print_header, print_result
+from problem_buffers import SharedRing
+
+
+def ring_producer(ring, payload_size, num_messages):
+    payload = bytes(payload_size)
+    for _ in range(num_messages):
+        ring.put(payload)
+    ring.close()
+
+
+def ring_consumer(ring):
+    while True:
+        with ring.get() as payload:
+            if payload is None:
+                return
+            # Touch it in place, like something using it would.
+            payload[-1]
+
+
+def queue_producer(q, payload_size, num_messages):
+    payload = bytes(payload_size)
+    for _ in range(num_messages):
+        q.put(payload)
+    q.put(None)
+
+
+def queue_consumer(q):
+    while True:
+        payload = q.get()
+        if payload is None:
+            return
+        payload[-1]
+
+
+def benchmark(producer, consumer, buffer, payload_size, num_messages):
+    processes = [multiprocessing.Process(target = producer, args = (buffer, payload_size, num_messages)),
+                 multiprocessing.Process(target = consumer, args = (buffer,))]
+
+    start = time.perf_counter()
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    capacity = 16
+
+    start = time.time()
+    print_header()
+    for payload_size in PAYLOAD_SIZES:
+        num_messages = get_num_messages(payload_size)
+        elapsed = benchmark(ring_producer, ring_consumer, SharedRing(capacity, payload_size), payload_size, num_messages)
+        print_result("SharedRing", payload_size, num_messages, elapsed)
+        elapsed = benchmark(queue_producer, queue_consumer, multiprocessing.Queue(capacity), payload_size, num_messages)
+        print_result("multiprocessing.Queue", payload_size, num_messages, elapsed)
+    print("Done (processes)")
+    print(humanfriendly.format_timespan(time.time() - start))
@@ -0,0 +1,50 @@
+import queue
+import threading
+import time
+import humanfriendly
+
+from _buffers import PAYLOAD_SIZES, get_num_messages, print_header, print_result
+from problem_buffers import BoundedQueue
+
+
+def producer(buffer, payload, num_messages):
+    for _ in range(num_messages):
+        buffer.put(payload)
+    buffer.put(None)
+
+
+def consumer(buffer):
+    while True:
+        payload = buffer.get()
+        if payload is None:
+            return
+        # Touch it, like something using it would.
+        payload[-1]
+
+
+def benchmark(buffer, payload_size, num_messages):
+    payload = bytes(payload_size)
+    threads = [threading.Thread(target = producer, args = (buffer, payload, num_messages)),
+               threading.Thread(target = consumer, args = (buffer,))]
+
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    capacity = 16
+
+    start = time.time()
+    print_header()
+    for payload_size in PAYLOAD_SIZES:
+        num_messages = get_num_messages(payload_size)
+        for name, buffer in [("BoundedQueue", BoundedQueue(capacity)), ("queue.Queue", queue.Queue(capacity))]:
+            # Threads pass the same payload by reference, whatever its size.
+            print_result(name, payload_size, num_messages, benchmark(buffer, payload_size, num_messages),
+                         copied = False)
+    print("Done (threading)")
+    print(humanfriendly.format_timespan(time.time() - start))
@@ -0,0 +1,160 @@
+import asyncio
+import collections
+import functools
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from multiprocessing import Pool as ProcessPool
+from multiprocessing.dummy import Pool as ThreadPool
+
+from _workloads import WORKLOADS, run_workload
+
+
+def _noop(_):
+    return None
+
+
+def get_chunks(items, chunksize):
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, chunksize))
+        if len(chunk) == 0:
+            return
+        yield chunk
+
+
+def percentile(values, q):
+    """Nearest rank percentile, q in [0, 100]."""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(q / 100.0 * len(ordered))) - 1))]
+
+
+# Every method takes a started pool, a task running a chunk (and returning its length) and
+# the chunks, and returns how long after submission each item's result was available.
+
+def run_map(pool, task, chunks):
+    start = time.perf_counter()
+    num_items = sum(pool.map(task, chunks, chunksize = 1))
+    # Nothing comes back before the whole batch is done.
+    return [time.perf_counter() - start] * num_items
+
+
+def run_imap_unordered(pool, task, chunks):
+    start = time.perf_counter()
+    latencies = []
+    for num_items in pool.imap_unordered(task, chunks, chunksize = 1):
+        latencies += [time.perf_counter() - start] * num_items
+    return latencies
+
+
+def run_futures(executor, task, chunks):
+    start = time.perf_counter()
+    futures = [executor.submit(task, chunk) for chunk in chunks]
+    latencies = []
+    for future in as_completed(futures):
+        latencies += [time.perf_counter() - start] * future.result()
+    return latencies
+
+
+def run_asyncio(executor, task, chunks):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    async def run():
+        start = time.perf_counter()
+        tasks = [loop.run_in_executor(executor, task, chunk) for chunk in chunks]
+        latencies = []
+        for future in asyncio.as_completed(tasks):
+            latencies += [time.perf_counter() - start] * (await future)
+        return latencies
+
+    try:
+        return loop.run_until_complete(run())
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+# method: (function running a batch, pool factories by kind)
+METHODS = collections.OrderedDict([
+    ("map", (run_map, {"threads": ThreadPool, "processes": ProcessPool})),
+    ("imap_unordered", (run_imap_unordered, {"threads": ThreadPool, "processes": ProcessPool})),
+    ("futures", (run_futures, {"threads": ThreadPoolExecutor, "processes": ProcessPoolExecutor})),
+    ("asyncio", (run_asyncio, {"threads": ThreadPoolExecutor, "processes": ProcessPoolExecutor})),
+])
+
+BenchmarkResult = collections.namedtuple("BenchmarkResult", [
+    "method", "kind", "workload", "size_of_queue", "num_items", "chunksize", "startup",
+    "items_per_second", "p50_latency", "p95_latency", "p99_latency"])
+
+
+def start_pool(kind, method, size_of_queue):
+    """Starts a pool, and makes sure its workers are all up. Returns it and how long that took."""
+    start = time.perf_counter()
+    factory = METHODS[method][1][kind]
+    if factory in (ThreadPool, ProcessPool):
+        pool = factory(processes = size_of_queue)
+        pool.map(_noop, range(size_of_queue), chunksize = 1)
+    else:
+        # Executors only start their workers as work is submitted.
+        pool = factory(max_workers = size_of_queue)
+        list(pool.map(_noop, range(size_of_queue)))
+    return pool, time.perf_counter() - start
+
+
+def stop_pool(pool):
+    if isinstance(pool, (ThreadPoolExecutor, ProcessPoolExecutor)):
+        pool.shutdown(wait = True)
+    else:
+        pool.close()
+        pool.join()
+
+
+def benchmark(kind, method, size_of_queue, workloads, nums_items, chunksizes, num_samples):
+    """Times every workload, number of items and chunksize on one persistent pool, started (and timed) once.
+
+    Items are submitted as chunks of chunksize items, which the workload runs in one go.
+    """
+    pool, startup = start_pool(kind, method, size_of_queue)
+    run = METHODS[method][0]
+    try:
+        for workload, num_items, chunksize in itertools.product(workloads, nums_items, chunksizes):
+            task = functools.partial(run_workload, workload)
+            chunks = list(get_chunks(range(num_items), chunksize))
+            latencies, elapsed = [], 0.0
+            for _ in range(num_samples):
+                start = time.perf_counter()
+                latencies += run(pool, task, chunks)
+                elapsed += time.perf_counter() - start
+
+            yield BenchmarkResult(method = method,
+                                  kind = kind,
+                                  workload = workload,
+                                  size_of_queue = size_of_queue,
+                                  num_items = num_items,
+                                  chunksize = chunksize,
+                                  startup = startup,
+                                  items_per_second = num_items * num_samples / elapsed,
+                                  p50_latency = percentile(latencies, 50),
+                                  p95_latency = percentile(latencies, 95),
+                                  p99_latency = percentile(latencies, 99))
+    finally:
+        stop_pool(pool)
+
+
+def run_suite(kind, sizes_of_queue, nums_items, chunksizes, num_samples, methods = None, workloads = None):
+    """Sweeps every method over every queue size, workload, number of items and chunksize."""
+    workloads = workloads or list(WORKLOADS)
+    for method in methods or METHODS:
+        for size_of_queue in sizes_of_queue:
+            for result in benchmark(kind, method, size_of_queue, workloads, nums_items, chunksizes, num_samples):
+                yield result
+
+
+def print_results(results):
+    print("{0:>15} {1:>10} {2:>14} {3:>6} {4:>6} {5:>6} {6:>10} {7:>12} {8:>10} {9:>10} {10:>10}".format(
+        "method", "kind", "workload", "size", "items", "chunk", "startup", "items/s", "p50", "p95", "p99"))
+    for result in results:
+        print("{0.method:>15} {0.kind:>10} {0.workload:>14} {0.size_of_queue:>6} {0.num_items:>6} {0.chunksize:>6} "
+              "{0.startup:>10.4f} {0.items_per_second:>12.1f} {0.p50_latency:>10.4f} "
+              "{0.p95_latency:>10.4f} {0.p99_latency:>10.4f}".format(result))
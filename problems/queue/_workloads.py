@@ -0,0 +1,52 @@
+import collections
+import hashlib
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# How much work every item is, the original task summed range(10000).
+WORK = 10000
+
+# What the GIL releasing kernel hashes per item, made once per process.
+_payload = None
+
+
+def python_loop(chunk, work = WORK):
+    """The original task: a pure Python loop per item, holding the GIL throughout."""
+    total = 0
+    for _ in chunk:
+        sum = 0
+        for i in range(work):
+            sum += i
+        total += sum
+    return total
+
+
+def numpy_kernel(chunk, work = WORK):
+    """The same sums, for the whole chunk in one vectorised call."""
+    return int(np.arange(work, dtype = np.int64).reshape(1, work).repeat(len(chunk), axis = 0).sum())
+
+
+def gil_releasing(chunk, work = WORK):
+    """Hashes work * 8 bytes per item, which hashlib does without holding the GIL."""
+    global _payload
+    if _payload is None or len(_payload) != work * 8:
+        _payload = bytes(work * 8)
+
+    digest = hashlib.sha256()
+    for _ in chunk:
+        digest.update(_payload)
+    return digest.hexdigest()
+
+
+WORKLOADS = collections.OrderedDict([("python", python_loop), ("gil_releasing", gil_releasing)])
+if np is not None:
+    WORKLOADS["numpy"] = numpy_kernel
+
+
+def run_workload(name, chunk):
+    """Runs a workload over a chunk of items, returns how many there were."""
+    WORKLOADS[name](chunk)
+    return len(chunk)
@@ -0,0 +1,87 @@
+import collections
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+
+from _pool_bench import percentile
+from problem_buffers import BoundedQueue, SharedRingBuffer
+
+# Consumers stop once they get this, every real item is a (positive) timestamp.
+STOP = -1.0
+
+QueueResult = collections.namedtuple("QueueResult", [
+    "queue", "producers", "consumers", "items_per_second", "p50_latency", "p95_latency", "p99_latency"])
+
+
+def produce(q, num_items):
+    for _ in range(num_items):
+        q.put(time.perf_counter())
+
+
+def consume(q, results):
+    """Gets items until told to stop, then hands back how long every item spent queued."""
+    latencies = []
+    while True:
+        item = q.get()
+        if item == STOP:
+            break
+        latencies.append(time.perf_counter() - item)
+    results.put(latencies)
+
+
+def run(q, worker, results, producers, consumers, num_items):
+    """Runs producers and consumers (threads or processes) through a queue, returns the results."""
+    consumer_workers = [worker(target = consume, args = (q, results)) for _ in range(consumers)]
+    producer_workers = [worker(target = produce, args = (q, num_items // producers)) for _ in range(producers)]
+
+    start = time.perf_counter()
+    for w in consumer_workers + producer_workers:
+        w.start()
+    for w in producer_workers:
+        w.join()
+    for _ in range(consumers):
+        q.put(STOP)
+    latencies = list(itertools.chain.from_iterable(results.get() for _ in range(consumers)))
+    elapsed = time.perf_counter() - start
+
+    for w in consumer_workers:
+        w.join()
+    return elapsed, latencies
+
+
+# name: (makes a queue of a capacity, worker type, makes a queue for the results)
+QUEUES = collections.OrderedDict([
+    ("BoundedQueue", (BoundedQueue, threading.Thread, queue.Queue)),
+    ("queue.Queue", (queue.Queue, threading.Thread, queue.Queue)),
+    ("SharedRingBuffer", (SharedRingBuffer, multiprocessing.Process, multiprocessing.Queue)),
+    ("multiprocessing.Queue", (multiprocessing.Queue, multiprocessing.Process, multiprocessing.Queue)),
+])
+
+
+def benchmark(name, producers, consumers, num_items, capacity):
+    make_queue, worker, make_results = QUEUES[name]
+    elapsed, latencies = run(make_queue(capacity), worker, make_results(), producers, consumers, num_items)
+    return QueueResult(queue = name,
+                       producers = producers,
+                       consumers = consumers,
+                       items_per_second = len(latencies) / elapsed,
+                       p50_latency = percentile(latencies, 50),
+                       p95_latency = percentile(latencies, 95),
+                       p99_latency = percentile(latencies, 99))
+
+
+if __name__ == "__main__":
+    capacity = 10
+    num_items = 20000
+    counts = [1, 2, 4]
+
+    print("{0:>22} {1:>9} {2:>9} {3:>12} {4:>10} {5:>10} {6:>10}".format(
+        "queue", "producers", "consumers", "items/s", "p50", "p95", "p99"))
+    for name in QUEUES:
+        for producers, consumers in itertools.product(counts, counts):
+            result = benchmark(name, producers, consumers, num_items, capacity)
+            print("{0.queue:>22} {0.producers:>9} {0.consumers:>9} {0.items_per_second:>12.1f} "
+                  "{0.p50_latency:>10.6f} {0.p95_latency:>10.6f} {0.p99_latency:>10.6f}".format(result))
+    print("Done (bounded queues)")
@@ -1,30 +1,10 @@
-import time
-from multiprocessing import Pool as PPool
-import humanfriendly
-
-def blah(j):
-    sum = 0
-    for i in range(10000):
-        sum += i
-
-
-def avg(lst):
-    return sum(lst) / len(lst)
-
+from _pool_bench import run_suite, print_results
 
 if __name__ == "__main__":
-    size_of_queue = 10
-    num_items = 1000
-    num_samples = 100
-
-    time_taken = []
-    for _ in range(num_samples):
-        start = time.time()
-        pool = PPool(processes = size_of_queue)
-        pool.map(blah, range(num_items))
-        pool.close()
-
-        time_taken.append(time.time() - start)
+    sizes_of_queue = [1, 4, 10]
+    nums_items = [100, 1000]
+    chunksizes = [1, 10, 100]
+    num_samples = 5
 
+    print_results(run_suite("processes", sizes_of_queue, nums_items, chunksizes, num_samples))
     print("Done (processes)")
-    print(humanfriendly.format_timespan(avg(time_taken)))
@@ -0,0 +1,185 @@
+import datetime
+import json
+import logging
+import os
+import platform
+import re
+import socket
+import sqlite3
+import subprocess
+import uuid
+
+import pandas as pd
+
+# The columns every test's rows are labelled with, which loads can be filtered by.
+LABELS = ["run_id", "problem", "runtime", "file", "source_hash", "toolchain"]
+
+# Legacy tables are named <problem>_<runtime>_<file>.csv and <problem>_first_<runtime>_<file>.csv
+LEGACY_TABLE = re.compile(r"^(?P<problem>.+?)_(?P<runtime>go|python3|pypy3)_(?P<file>.+)\.csv$")
+
+
+def _get_git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr = subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _same(a, b):
+    """Where two columns are equal, counting two missing values as equal."""
+    return (a == b) | (a.isnull() & b.isnull())
+
+
+class ResultStore(object):
+    """An append-only store of every run's results, in a single SQLite database.
+
+    Each run gets a row of metadata (git commit, host, executor, ...), and every sample
+    and first run row is labelled with the run, problem, runtime, file, source hash and
+    toolchain it came from, which are indexed for filtered loads.  Nothing is ever
+    overwritten: the current results of a test are the ones with its latest source hash
+    and toolchain, from the last run that re-ran it from scratch (superseding the rest) on.
+    """
+
+    def __init__(self, path = "results/results.db"):
+        directory = os.path.dirname(path)
+        if directory != "" and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS runs ("
+                                "run_id TEXT PRIMARY KEY, started TEXT, git_commit TEXT, host TEXT, "
+                                "platform TEXT, cpus INTEGER, executor TEXT, python TEXT, configs TEXT)")
+        self.connection.commit()
+
+    def start_run(self, configs = None, run_id = None, started = None):
+        """Records the metadata of a new run, returns its id."""
+        run_id = run_id or datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%S") + "_" + uuid.uuid4().hex[:8]
+        config_dict = vars(configs) if configs is not None else {}
+        self.connection.execute("INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                (run_id,
+                                 started or datetime.datetime.utcnow().isoformat() + "Z",
+                                 _get_git_commit(),
+                                 socket.gethostname(),
+                                 platform.platform(),
+                                 os.cpu_count(),
+                                 config_dict.get("executor"),
+                                 platform.python_version(),
+                                 json.dumps(config_dict, sort_keys = True, default = str)))
+        self.connection.commit()
+        logging.info("Started run: {0}".format(run_id))
+        return run_id
+
+    def _get_columns(self, table):
+        return [row[1] for row in self.connection.execute("PRAGMA table_info({0})".format(table))]
+
+    def _append(self, table, df):
+        existing = self._get_columns(table)
+        if len(existing) == 0:
+            df.to_sql(table, self.connection, index = False)
+            self.connection.execute("CREATE INDEX IF NOT EXISTS {0}_labels ON {0} "
+                                    "(problem, runtime, file, source_hash, run_id)".format(table))
+        else:
+            # New metrics just become new columns, empty for the older rows.
+            for column in df.columns:
+                if column not in existing:
+                    self.connection.execute('ALTER TABLE {0} ADD COLUMN "{1}"'.format(table, column))
+            df.to_sql(table, self.connection, index = False, if_exists = "append")
+        self.connection.commit()
+
+    def append(self, table, labels, df):
+        """Appends rows to a table, labelled with the run and test they came from."""
+        df = pd.DataFrame(df).copy()
+        for label in LABELS:
+            df[label] = labels.get(label)
+        self._append(table, df)
+
+    def load(self, table, **filters):
+        """Loads the rows of a table matching every label given, e.g. load("samples", problem = "queue")."""
+        if len(self._get_columns(table)) == 0:
+            return pd.DataFrame(columns = LABELS)
+
+        clauses, values = [], []
+        for label, value in filters.items():
+            if label not in LABELS:
+                raise ValueError("Can't filter on: " + label)
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                clauses.append("{0} IN ({1})".format(label, ", ".join("?" * len(value))))
+                values.extend(value)
+            else:
+                clauses.append("{0} = ?".format(label))
+                values.append(value)
+
+        query = "SELECT {0}.* FROM {0} JOIN runs USING (run_id)".format(table)
+        if len(clauses) > 0:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY runs.started"
+        return pd.read_sql_query(query, self.connection, params = values)
+
+    def supersede(self, table, labels):
+        """Marks the rows of a test stored before this run as no longer current, when it's re-run from scratch."""
+        row = {label: labels.get(label) for label in LABELS}
+        row["table_name"] = table
+        self._append("superseded", pd.DataFrame([row]))
+
+    def load_current(self, table, **filters):
+        """Like `load`, but only the rows of each test from its latest source hash and toolchain,
+        and from no earlier than the last run that superseded them.
+        """
+        df = self.load(table, **filters)
+        if len(df) == 0:
+            return df
+
+        keys = ["problem", "runtime", "file"]
+        # Rows are in run order, so the last row of a test has its latest source hash and toolchain.
+        latest = df.groupby(keys).tail(1)[keys + ["source_hash", "toolchain"]]
+        latest = latest.rename(columns = {"source_hash": "latest_hash", "toolchain": "latest_toolchain"})
+        df = df.merge(latest, on = keys, how = "left")
+        current = _same(df["source_hash"], df["latest_hash"]) & _same(df["toolchain"], df["latest_toolchain"])
+        df = df[current].drop(columns = ["latest_hash", "latest_toolchain"])
+
+        superseded = self.load("superseded", **filters)
+        if len(superseded) > 0:
+            superseded = superseded[superseded["table_name"] == table]
+        if len(superseded) > 0:
+            started = self.load_runs().set_index("run_id")["started"]
+            cutoff = superseded.assign(cutoff = superseded["run_id"].map(started)).groupby(keys)["cutoff"].max()
+            df = df.merge(cutoff.reset_index(), on = keys, how = "left")
+            df = df[df["cutoff"].isnull() | (df["run_id"].map(started) >= df["cutoff"])].drop(columns = ["cutoff"])
+
+        return df.reset_index(drop = True)
+
+    def load_runs(self):
+        return pd.read_sql_query("SELECT * FROM runs ORDER BY started", self.connection)
+
+    def import_tables(self, directory):
+        """Imports the per test CSV tables written before there was a store, as a run called legacy."""
+        run_id = "legacy"
+        if self.connection.execute("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)).fetchone() is not None:
+            logging.info("Legacy tables already imported.")
+            return
+
+        # They're older than any run that will be stored.
+        self.start_run(run_id = run_id, started = "1970-01-01T00:00:00Z")
+        for name in sorted(os.listdir(directory)):
+            match = LEGACY_TABLE.match(name)
+            if match is None:
+                continue
+
+            problem, table = match.group("problem"), "samples"
+            if problem.endswith("_first"):
+                problem, table = problem[:-len("_first")], "first_run"
+
+            logging.info("Importing: {0}".format(name))
+            self.append(table, {"run_id": run_id,
+                                "problem": problem,
+                                "runtime": match.group("runtime"),
+                                "file": match.group("file")},
+                        pd.read_csv(os.path.join(directory, name), index_col = 0))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level = logging.INFO)
+    ResultStore().import_tables("results/tables")
@@ -0,0 +1,99 @@
+import itertools
+import multiprocessing
+
+try:
+    import sync_profile as sync
+except ImportError:
+    # Only next to the problems when run by the harness, which can profile them.
+    import threading as sync
+
+
+class _Count(object):
+    def __init__(self):
+        self.value = 0
+
+
+class ReusableBarrier(object):
+    """The book's reusable barrier, with preloaded turnstiles, for threads (or processes).
+
+    Everyone waits at the first turnstile until the last party arrives and lets all n through,
+    then at the second until the last one leaves and lets all n through that, so nobody can
+    lap the others into the next round.
+    """
+
+    def __init__(self, parties, processes = False):
+        self.parties = parties
+        if processes:
+            self.mutex = multiprocessing.Lock()
+            self.turnstile = multiprocessing.Semaphore(0)
+            self.turnstile2 = multiprocessing.Semaphore(0)
+            self.count = multiprocessing.RawValue("i", 0)
+        else:
+            self.mutex = sync.Lock()
+            self.turnstile = sync.Semaphore(0)
+            self.turnstile2 = sync.Semaphore(0)
+            self.count = _Count()
+
+    def _signal(self, semaphore):
+        for _ in range(self.parties):
+            semaphore.release()
+
+    def wait(self):
+        with self.mutex:
+            self.count.value += 1
+            if self.count.value == self.parties:
+                self._signal(self.turnstile)
+        self.turnstile.acquire()
+
+        with self.mutex:
+            self.count.value -= 1
+            if self.count.value == 0:
+                self._signal(self.turnstile2)
+        self.turnstile2.acquire()
+
+
+def pipeline_stage(iterable, function, num_workers):
+    """Streams an iterable through a pool of threads, in rounds of one item per worker.
+
+    Every round, the next num_workers items are handed out and the stage waits (on a barrier)
+    for all of them to be done before yielding their results, in order, and starting the next.
+    """
+    barrier = ReusableBarrier(num_workers + 1)
+    state = {"batch": None, "results": [None] * num_workers, "error": None}
+
+    def worker(index):
+        while True:
+            barrier.wait()
+            batch = state["batch"]
+            if batch is None:
+                return
+            if index < len(batch):
+                try:
+                    state["results"][index] = function(batch[index])
+                except Exception as e:
+                    # Raised by the stage once the round is over, the workers have to keep going.
+                    state["error"] = e
+            barrier.wait()
+
+    workers = [sync.Thread(target = worker, args = (i,)) for i in range(num_workers)]
+    for w in workers:
+        w.start()
+
+    iterator = iter(iterable)
+    try:
+        while True:
+            batch = list(itertools.islice(iterator, num_workers))
+            if len(batch) == 0:
+                break
+            state["batch"] = batch
+            # Start the round, then wait for it to finish.
+            barrier.wait()
+            barrier.wait()
+            if state["error"] is not None:
+                raise state["error"]
+            yield state["results"][:len(batch)]
+    finally:
+        state["batch"] = None
+        barrier.wait()
+        for w in workers:
+            w.join()
@@ -1,24 +1,54 @@
-def barrier(gen, size):
-    def real_decorator(original_func):
-        def wrapper(*args, **kwargs):
-            work = []
-            my_iter = gen()
-            for _ in range(size):
-                work.append(my_iter.__next__())
+import collections
+import multiprocessing
+import threading
+import time
+import humanfriendly
 
-            original_func(work, *args, **kwargs)
-        return wrapper
-    return real_decorator
+from _barrier import ReusableBarrier, pipeline_stage
+
+# name: (makes a barrier for a number of parties, worker type)
+BARRIERS = collections.OrderedDict([
+    ("ReusableBarrier (threads)", (ReusableBarrier, threading.Thread)),
+    ("threading.Barrier", (threading.Barrier, threading.Thread)),
+    ("ReusableBarrier (processes)", (lambda parties: ReusableBarrier(parties, processes = True),
+                                     multiprocessing.Process)),
+    ("multiprocessing.Barrier", (multiprocessing.Barrier, multiprocessing.Process)),
+])
+
+
+def cross(barrier, rounds):
+    for _ in range(rounds):
+        barrier.wait()
+
+
+def crossings_per_second(name, parties, rounds):
+    """How many times a second every party can get through the barrier together."""
+    make_barrier, worker = BARRIERS[name]
+    barrier = make_barrier(parties)
+    workers = [worker(target = cross, args = (barrier, rounds)) for _ in range(parties)]
+
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return rounds / (time.perf_counter() - start)
 
 
 def produce_work():
     yield from range(100)
 
 
-@barrier(size = 10, gen = produce_work)
-def group_by(work):
-    print("Got work: {0}".format(", ".join(map(str, work))))
+if __name__ == "__main__":
+    rounds = 2000
+    parties = [2, 4, 8, 16]
 
+    start = time.time()
+    print("{0:>28} {1:>8} {2:>12}".format("barrier", "parties", "crossings/s"))
+    for name in BARRIERS:
+        for n in parties:
+            print("{0:>28} {1:>8} {2:>12.1f}".format(name, n, crossings_per_second(name, n, rounds)))
 
-if __name__ == "__main__":
-    group_by()
+    for results in pipeline_stage(produce_work(), lambda item: item * item, num_workers = 10):
+        print("Got work: {0}".format(", ".join(map(str, results))))
+    print(humanfriendly.format_timespan(time.time() - start))
@@ -0,0 +1,246 @@
+import logging
+import os
+import sys
+import time
+
+import matplotlib
+# Figures are only ever saved.
+matplotlib.use("Agg")
+from matplotlib import pyplot as plt
+import numpy as np
+import pandas as pd
+
+import executors
+import scheduler
+from manifest import ResultManifest
+from results_store import ResultStore
+from testing import get_args, _configure_logging, _get_labels, build_test_images, run_sample
+
+# A sweep without a memory limit stores this as its limit, so it can still be grouped on.
+NO_LIMIT = "none"
+
+KEYS = ["problem", "runtime", "file"]
+# Every curve is over the core counts of one test, with one memory limit and way of limiting cores.
+CURVE_KEYS = KEYS + ["mode", "memory_limit"]
+
+
+def parse_list(value):
+    return [item.strip() for item in str(value or "").split(",") if item.strip() != ""]
+
+
+def get_limits(cores, memory, mode):
+    """The cpuset and Limits to run a sample on `cores` cores with, under `mode`."""
+    memory = None if memory == NO_LIMIT else memory
+    if mode == "cpuset":
+        cpuset = ",".join(map(str, scheduler.available_cpus()[:cores]))
+        return cpuset, executors.Limits(cpus = None, memory = memory)
+    return None, executors.Limits(cpus = cores, memory = memory)
+
+
+def run_sweep(executor, store, run_id, targets, core_counts, memory_limits, configs):
+    """Runs every test with every memory limit and core count, storing a row per sample in the scaling table."""
+    for target in targets:
+        for memory in memory_limits:
+            for cores in core_counts:
+                cpuset, limits = get_limits(cores, memory, configs.mode)
+                logging.info("Sweeping {0} on {1} core(s), memory limit {2}".format(target.key, cores, memory))
+
+                rows = []
+                for iteration in target.samples:
+                    result = None
+                    for _ in range(configs.max_retries + 1):
+                        result = run_sample(executor, target, iteration, cpuset = cpuset,
+                                            max_drift = configs.max_drift, limits = limits)
+                        if result is not None:
+                            break
+                        logging.warning("Retrying after timeout: {0} [{1}]".format(target.image_name, iteration))
+                        time.sleep(10)
+
+                    if result is None:
+                        logging.warning("Giving up on sample: {0} [{1}]".format(target.image_name, iteration))
+                        continue
+
+                    row = {"cores": cores,
+                           "memory_limit": memory,
+                           "mode": configs.mode,
+                           "iteration": iteration,
+                           "status": result.status,
+                           "time_taken": result.time_taken,
+                           "test_time": result.test_time,
+                           "normalized_test": (1 / result.test_time) * result.time_taken}
+                    row.update(result.system_info.summary())
+                    rows.append(row)
+
+                if len(rows) > 0:
+                    store.append("scaling", _get_labels(target, run_id), rows)
+
+
+def fit_amdahl(cores, speedups, base_cores):
+    """Least squares fit of the parallel fraction p in Amdahl's law, to speedups relative to base_cores.
+
+    On n cores a run takes (1 - p) + p / n of its time on one, so relative to base_cores the
+    speedup is ((1 - p) + p / base_cores) / ((1 - p) + p / n).  p is found on a fine grid, as
+    it only ranges from 0 to 1.  Returns p and the RMS error of the fit.
+    """
+    cores = np.asarray(cores, dtype = float)
+    speedups = np.asarray(speedups, dtype = float)
+    fractions = np.linspace(0.0, 1.0, 1001)[:, np.newaxis]
+
+    predicted = ((1 - fractions) + fractions / base_cores) / ((1 - fractions) + fractions / cores)
+    errors = np.sqrt(((predicted - speedups) ** 2).mean(axis = 1))
+    best = int(errors.argmin())
+    return float(fractions[best, 0]), float(errors[best])
+
+
+def amdahl_speedup(p, cores):
+    """Speedup on `cores` cores over one, for parallel fraction p."""
+    return 1.0 / ((1 - p) + p / np.asarray(cores, dtype = float))
+
+
+def analyse(df, metric):
+    """Speedup and efficiency curves of every test, and their Amdahl fits.
+
+    Speedups and efficiencies are relative to the fewest cores each curve has a successful
+    sample on, which is one core unless the sweep didn't include it.  Failed samples (like
+    runs killed by a memory limit) are counted at each point rather than timed, and a point
+    where every sample failed has no speedup.
+    """
+    df = df.assign(passed = df["status"] == 0)
+    points = df.groupby(CURVE_KEYS + ["cores"])
+    curves = pd.DataFrame({"median": points.apply(lambda point: point.loc[point["passed"], metric].median()),
+                           "samples": points["passed"].sum(),
+                           "failed": points["passed"].count() - points["passed"].sum()}).reset_index()
+
+    curve_rows, fit_rows = [], []
+    for name, curve in curves.groupby(CURVE_KEYS):
+        curve = curve.sort_values("cores")
+        timed = curve[curve["median"].notnull()]
+        base_cores = timed["cores"].iloc[0] if len(timed) > 0 else np.nan
+        base_time = timed["median"].iloc[0] if len(timed) > 0 else np.nan
+
+        speedups = base_time / curve["median"]
+        efficiencies = speedups * base_cores / curve["cores"]
+        for (_, row), speedup, efficiency in zip(curve.iterrows(), speedups, efficiencies):
+            curve_row = dict(zip(CURVE_KEYS, name))
+            curve_row.update({"cores": int(row["cores"]),
+                              "samples": int(row["samples"]),
+                              "failed": int(row["failed"]),
+                              "median": row["median"],
+                              "speedup": speedup,
+                              "efficiency": efficiency})
+            curve_rows.append(curve_row)
+
+        fitted = speedups.notnull()
+        if fitted.sum() < 2:
+            continue
+        p, error = fit_amdahl(curve["cores"][fitted], speedups[fitted], base_cores)
+        fit_row = dict(zip(CURVE_KEYS, name))
+        fit_row.update({"base_cores": int(base_cores),
+                        "max_cores": int(curve["cores"][fitted].iloc[-1]),
+                        "parallel_fraction": p,
+                        "max_speedup": 1.0 / (1 - p) if p < 1 else float("inf"),
+                        "fit_error": error,
+                        "max_efficiency": efficiencies[fitted].iloc[-1],
+                        "failed": int(curve["failed"].sum())})
+        fit_rows.append(fit_row)
+
+    return (pd.DataFrame(curve_rows, columns = CURVE_KEYS + ["cores", "samples", "failed", "median", "speedup",
+                                                             "efficiency"]),
+            pd.DataFrame(fit_rows, columns = CURVE_KEYS + ["base_cores", "max_cores", "parallel_fraction",
+                                                           "max_speedup", "fit_error", "max_efficiency", "failed"]))
+
+
+def plot_scaling(curves, fits, output):
+    """A figure per problem, memory limit and mode, with the speedup and efficiency of every implementation."""
+    for (problem, mode, memory), df in curves.groupby(["problem", "mode", "memory_limit"]):
+        figure, (speedup_ax, efficiency_ax) = plt.subplots(1, 2, figsize = (12, 5))
+        max_cores = df["cores"].max()
+        ideal = np.arange(1, max_cores + 1)
+
+        for (runtime, file), curve in df.groupby(["runtime", "file"]):
+            label = "{0} {1}".format(runtime, file)
+            line, = speedup_ax.plot(curve["cores"], curve["speedup"], marker = "o", label = label)
+            efficiency_ax.plot(curve["cores"], curve["efficiency"], marker = "o", label = label,
+                               color = line.get_color())
+            # Points with failed samples are marked along the bottom, so they don't just go missing.
+            failed = curve[curve["failed"] > 0]
+            speedup_ax.plot(failed["cores"], [0] * len(failed), marker = "x", linestyle = "none",
+                            color = line.get_color())
+
+            fit = fits[(fits["problem"] == problem) & (fits["runtime"] == runtime) & (fits["file"] == file) &
+                       (fits["mode"] == mode) & (fits["memory_limit"] == memory)]
+            if len(fit) > 0:
+                fit = fit.iloc[0]
+                base = fit["base_cores"]
+                fitted = amdahl_speedup(fit["parallel_fraction"], ideal) / amdahl_speedup(fit["parallel_fraction"], base)
+                speedup_ax.plot(ideal, fitted, linestyle = ":", color = line.get_color(),
+                                label = "{0} (p = {1:.3f})".format(label, fit["parallel_fraction"]))
+
+        speedup_ax.plot(ideal, ideal / df["cores"].min(), linestyle = "--", color = "grey", label = "ideal")
+        efficiency_ax.axhline(1.0, linestyle = "--", color = "grey")
+
+        speedup_ax.set_xlabel("cores")
+        speedup_ax.set_ylabel("speedup")
+        efficiency_ax.set_xlabel("cores")
+        efficiency_ax.set_ylabel("parallel efficiency")
+        for ax in [speedup_ax, efficiency_ax]:
+            ax.grid(True)
+        speedup_ax.legend(fontsize = "small")
+
+        figure.suptitle("{0} ({1}, memory limit {2})".format(problem, mode, memory))
+        figure.tight_layout()
+        figure.savefig(os.path.join(output, "_".join([problem, mode, memory]) + ".png"))
+        plt.close(figure)
+
+
+if __name__ == "__main__":
+    _configure_logging()
+    configs = get_args("scaling.yaml")
+
+    problems = parse_list(configs.problem) or None
+    store = ResultStore(configs.store)
+
+    if not configs.analyse_only:
+        available = len(scheduler.available_cpus())
+        core_counts = sorted(set(int(cores) for cores in parse_list(configs.cores)))
+        if any(cores > available for cores in core_counts):
+            logging.warning("Only {0} cores available, skipping: {1}".format(
+                available, [cores for cores in core_counts if cores > available]))
+            core_counts = [cores for cores in core_counts if cores <= available]
+        memory_limits = parse_list(configs.memory) or [NO_LIMIT]
+        if configs.executor == "local" and memory_limits != [NO_LIMIT]:
+            logging.error("Memory limits need the docker executor, there's no way to limit resident memory locally.")
+            sys.exit(1)
+
+        run_id = store.start_run(configs)
+        executor = executors.get_executor(configs)
+
+        logging.info("Finding tests.")
+        targets = list(build_test_images(executor, ResultManifest(), store, configs.sample_size,
+                                         auto_skip = False, problems = problems))
+        executor.log_build_summary()
+
+        logging.info("Sweeping {0} tests over {1} core counts and {2} memory limits".format(
+            len(targets), len(core_counts), len(memory_limits)))
+        run_sweep(executor, store, run_id, targets, core_counts, memory_limits, configs)
+
+    df = store.load_current("scaling", problem = problems)
+    if len(df) == 0:
+        logging.warning("No scaling results found in: {0}".format(configs.store))
+        exit(0)
+
+    curves, fits = analyse(df, configs.metric)
+    if not os.path.exists(configs.output):
+        os.makedirs(configs.output)
+
+    for problem, table in curves.groupby("problem"):
+        table.to_csv(os.path.join(configs.output, problem + ".csv"), index = False)
+    fits.to_csv(os.path.join(configs.output, "amdahl.csv"), index = False)
+
+    print(fits.to_string(index = False))
+    failures = curves[curves["failed"] > 0]
+    if len(failures) > 0:
+        failures.to_csv(os.path.join(configs.output, "failures.csv"), index = False)
+        logging.warning("{0} point(s) had failed samples, see failures.csv:\n{1}".format(
+            len(failures), failures[CURVE_KEYS + ["cores", "samples", "failed"]].to_string(index = False)))
+    plot_scaling(curves, fits, configs.output)
@@ -0,0 +1,92 @@
+import logging
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+def available_cpus():
+    """The cores this process is allowed to run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class CorePool(object):
+    """Hands out disjoint sets of cores, so that two concurrent jobs never share a core."""
+
+    def __init__(self, cpus, cores_per_job = 1):
+        cores_per_job = max(1, min(cores_per_job, len(cpus)))
+        self._free = queue.Queue()
+        for i in range(0, len(cpus) - cores_per_job + 1, cores_per_job):
+            self._free.put(",".join(map(str, cpus[i:i + cores_per_job])))
+        self.size = self._free.qsize()
+
+    def acquire(self):
+        # Blocks until another job gives its cores back.
+        return self._free.get()
+
+    def release(self, cpuset):
+        self._free.put(cpuset)
+
+
+class NoPinning(object):
+    """Stand-in for CorePool when jobs may run on any core."""
+
+    size = None
+
+    def acquire(self):
+        return None
+
+    def release(self, cpuset):
+        pass
+
+
+def get_core_pool(pin_cpus, cores_per_job, workers):
+    """Core sets for `workers` concurrent jobs, or no pinning at all if there's only one at a time.
+
+    A single job runs on every core, as the tests always have.  Otherwise the cores are
+    shared out evenly between the workers, unless cores_per_job says how many each gets.
+    """
+    cpus = available_cpus()
+    if workers <= 0:
+        workers = len(cpus)
+    if not pin_cpus or workers == 1:
+        return NoPinning()
+
+    if cores_per_job <= 0:
+        cores_per_job = max(1, len(cpus) // workers)
+    cores = CorePool(cpus, cores_per_job)
+    logging.info("Pinning jobs to {0} sets of {1} core(s)".format(cores.size, cores_per_job))
+    return cores
+
+
+def get_concurrency(workers, cores):
+    """The number of jobs to run at once, limited by the number of core sets if pinning."""
+    if workers <= 0:
+        workers = len(available_cpus())
+    if cores.size is not None and workers > cores.size:
+        logging.warning("Only {0} core sets available, limiting workers from {1}".format(cores.size, workers))
+        workers = cores.size
+    return workers
+
+
+class JobPool(object):
+    """Runs jobs on a pool of worker threads, more of which can be added as results come in."""
+
+    def __init__(self, run_job, workers):
+        self.run_job = run_job
+        self.pool = ThreadPoolExecutor(max_workers = workers)
+        self.futures = {}
+
+    def submit(self, job):
+        self.futures[self.pool.submit(self.run_job, job)] = job
+
+    def results(self):
+        """Yields (job, result) as each one finishes, until there's nothing left to run."""
+        try:
+            while len(self.futures) > 0:
+                done, _ = wait(self.futures, return_when = FIRST_COMPLETED)
+                for future in done:
+                    yield self.futures.pop(future), future.result()
+        finally:
+            self.pool.shutdown()
@@ -0,0 +1,200 @@
+import datetime
+import math
+import random
+from array import array
+
+import numpy as np
+
+
+def _parse_read_time(read):
+    """Docker reports times with nanoseconds, which datetime can't parse."""
+    seconds, _, fraction = read.rstrip("Z").partition(".")
+    parsed = datetime.datetime.strptime(seconds, "%Y-%m-%dT%H:%M:%S")
+    epoch = (parsed - datetime.datetime(1970, 1, 1)).total_seconds()
+    return epoch + (float("0." + fraction) if fraction != "" else 0.0)
+
+
+def _format_read_time(epoch):
+    return datetime.datetime.utcfromtimestamp(epoch).isoformat() + "Z"
+
+
+def _get_cpu_counters(cpu_stats):
+    """Returns (total, user, kernel, system, online cpus, per cpu) from a cpu_stats dict.
+
+    Anything missing (like the precpu_stats of the first sample) comes back as NaN.
+    """
+    cpu_usage = cpu_stats.get("cpu_usage", {})
+    per_cpu = cpu_usage.get("percpu_usage") or []
+    online_cpus = cpu_stats.get("online_cpus") or len(per_cpu) or 1
+    return (cpu_usage.get("total_usage", math.nan),
+            cpu_usage.get("usage_in_usermode", math.nan),
+            cpu_usage.get("usage_in_kernelmode", math.nan),
+            cpu_stats.get("system_cpu_usage", math.nan),
+            online_cpus,
+            per_cpu)
+
+
+def cpu_percent(usage_delta, system_delta, online_cpus):
+    """Share of the host's CPU time used over an interval, where one busy core is 100%.
+
+    This is the same calculation `docker stats` does.
+    """
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        percent = np.asarray(usage_delta, dtype = float) / system_delta * online_cpus * 100.0
+    return np.nan_to_num(np.where(np.asarray(system_delta) > 0, percent, 0.0))
+
+
+class RunningStat(object):
+    """Running min/max/mean of a value, plus a fixed size reservoir for its percentiles.
+
+    The reservoir is exact until it fills up, after which it holds a uniform random
+    sample of everything seen so far.
+    """
+
+    def __init__(self, reservoir_size = 1024):
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.mean = 0.0
+        self.reservoir_size = reservoir_size
+        self.reservoir = array("d")
+        self._random = random.Random(0)
+
+    def add(self, value):
+        self.count += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.mean += (value - self.mean) / self.count
+
+        if len(self.reservoir) < self.reservoir_size:
+            self.reservoir.append(value)
+        else:
+            i = self._random.randrange(self.count)
+            if i < self.reservoir_size:
+                self.reservoir[i] = value
+
+    def percentile(self, p):
+        if self.count == 0:
+            return 0.0
+        ordered = sorted(self.reservoir)
+        rank = max(0, int(math.ceil(p / 100.0 * len(ordered))) - 1)
+        return ordered[rank]
+
+
+class StatsAggregator(object):
+    """Folds docker stats dicts into running summaries as they arrive.
+
+    Nothing is kept per sample, except a compact time series of the raw counters of the
+    first run, if asked for.  The columns that are plotted are derived from those all at
+    once by `series_columns`.
+    """
+
+    COUNTERS = ["total", "user", "kernel", "system", "pre_total", "pre_user", "pre_kernel", "pre_system",
+                "online_cpus", "memory_usage", "max_memory_usage", "memory_cache"]
+
+    def __init__(self, keep_series = False):
+        self.keep_series = keep_series
+        self.samples = 0
+        self.cpu_time = 0
+        self.user_cpu_time = 0
+        self.kernel_cpu_time = 0
+        self.cpu_percentages = RunningStat()
+        self.memory_usage = RunningStat()
+        self.max_memory_usage = 0
+
+        self.time_recorded = array("d")
+        self.counters = {counter: array("d") for counter in self.COUNTERS}
+        self.per_cpu = []
+        self.pre_per_cpu = []
+
+    def add(self, stats):
+        total, user, kernel, system, online_cpus, per_cpu = _get_cpu_counters(stats["cpu_stats"])
+        pre_total, pre_user, pre_kernel, pre_system, _, pre_per_cpu = \
+            _get_cpu_counters(stats.get("precpu_stats") or {})
+        memory_stats = stats["memory_stats"]
+
+        self.samples += 1
+        self.cpu_time = max(self.cpu_time, total)
+        self.user_cpu_time = max(self.user_cpu_time, user)
+        self.kernel_cpu_time = max(self.kernel_cpu_time, kernel)
+        if not math.isnan(pre_total) and not math.isnan(pre_system):
+            self.cpu_percentages.add(float(cpu_percent(total - pre_total, system - pre_system, online_cpus)))
+        self.memory_usage.add(memory_stats["usage"])
+        self.max_memory_usage = max(self.max_memory_usage, memory_stats["max_usage"])
+
+        if self.keep_series:
+            self.time_recorded.append(_parse_read_time(stats["read"]))
+            values = [total, user, kernel, system, pre_total, pre_user, pre_kernel, pre_system, online_cpus,
+                      memory_stats["usage"], memory_stats["max_usage"], memory_stats["stats"].get("cache", 0)]
+            for counter, value in zip(self.COUNTERS, values):
+                self.counters[counter].append(value)
+            self._append_per_cpu(self.per_cpu, per_cpu)
+            self._append_per_cpu(self.pre_per_cpu, pre_per_cpu)
+
+    def add_totals(self, user_cpu_time, kernel_cpu_time, max_memory_usage):
+        """Folds in the final totals of the run (in ns and bytes), for when they're known at the end."""
+        self.user_cpu_time = max(self.user_cpu_time, user_cpu_time)
+        self.kernel_cpu_time = max(self.kernel_cpu_time, kernel_cpu_time)
+        self.cpu_time = max(self.cpu_time, user_cpu_time + kernel_cpu_time)
+        self.max_memory_usage = max(self.max_memory_usage, max_memory_usage)
+
+    def _append_per_cpu(self, columns, per_cpu):
+        # Every core gets a column, padded with NaN for samples that didn't report it.
+        while len(columns) < len(per_cpu):
+            columns.append(array("d", [math.nan] * (len(self.time_recorded) - 1)))
+        for core, column in enumerate(columns):
+            column.append(per_cpu[core] if core < len(per_cpu) else math.nan)
+
+    def summary(self):
+        """The overall numbers for the run, one row of the overall table."""
+        return {
+            "cpu_time": self.cpu_time / 1e9,
+            "user_cpu_time": self.user_cpu_time / 1e9,
+            "kernel_cpu_time": self.kernel_cpu_time / 1e9,
+            "avg_cpu_percent": self.cpu_percentages.mean,
+            "max_cpu_percent": self.cpu_percentages.max or 0.0,
+            "p95_cpu_percent": self.cpu_percentages.percentile(95),
+            "avg_memory_usage": self.memory_usage.mean,
+            "max_memory_usage": self.max_memory_usage,
+            "min_memory_usage": self.memory_usage.min or 0,
+            "p50_memory_usage": self.memory_usage.percentile(50),
+            "p95_memory_usage": self.memory_usage.percentile(95),
+        }
+
+    def series_columns(self):
+        """The time series of the run as columns, one row per stats sample.
+
+        CPU usage is turned into a percentage per interval from the difference between
+        each sample's cpu_stats and precpu_stats, in total, per core and split by user
+        and kernel time.
+        """
+        c = {counter: np.asarray(values, dtype = float) for counter, values in self.counters.items()}
+        system_delta = c["system"] - c["pre_system"]
+        online_cpus = c["online_cpus"]
+
+        columns = {
+            "time_recorded": [_format_read_time(epoch) for epoch in self.time_recorded],
+            "total_cpu_usage": c["total"],
+            "user_cpu_usage": c["user"],
+            "kernel_cpu_usage": c["kernel"],
+            "cpu_percent": cpu_percent(c["total"] - c["pre_total"], system_delta, online_cpus),
+            "user_cpu_percent": cpu_percent(c["user"] - c["pre_user"], system_delta, online_cpus),
+            "kernel_cpu_percent": cpu_percent(c["kernel"] - c["pre_kernel"], system_delta, online_cpus),
+            "avg_memory_usage": c["memory_usage"],
+            "max_memory_usage": c["max_memory_usage"],
+            "memory_cache": c["memory_cache"],
+        }
+
+        if len(self.per_cpu) > 0:
+            per_cpu = np.vstack([np.asarray(values, dtype = float) for values in self.per_cpu])
+            pre_per_cpu = np.full_like(per_cpu, np.nan)
+            for core, values in enumerate(self.pre_per_cpu):
+                pre_per_cpu[core] = np.asarray(values, dtype = float)
+
+            per_cpu_percent = cpu_percent(per_cpu - pre_per_cpu, system_delta, online_cpus)
+            for core in range(len(per_cpu_percent)):
+                columns["cpu{0}_percent".format(core)] = per_cpu_percent[core]
+            columns["avg_per_usage"] = np.nanmean(per_cpu, axis = 0)
+            columns["avg_per_cpu_percent"] = per_cpu_percent.mean(axis = 0)
+
+        return columns
@@ -0,0 +1,356 @@
+"""Opt-in instrumented versions of the threading primitives.
+
+With SYNC_PROFILE=1 in the environment, Lock, RLock, Semaphore, Event, Condition and Barrier from
+here count their acquisitions, keep histograms of how long they were waited on and held, and
+which call sites had to wait, and print a summary as the program exits for the harness to
+collect.  Otherwise they're just the threading ones, so leaving them in costs nothing.
+
+Problems import it with a fallback, as it's only next to them when run by the harness:
+
+    try:
+        import sync_profile as sync
+    except ImportError:
+        import threading as sync
+"""
+import atexit
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+ENABLED = os.environ.get("SYNC_PROFILE", "0") not in ["", "0"]
+
+# The summary is printed on a line of its own, starting with this.
+MARKER = "SYNC_PROFILE "
+
+# Histogram bucket i counts times of less than 2 ** i microseconds (and at least half that).
+NUM_BUCKETS = 32
+# How many of the most contended call sites to keep per primitive.
+NUM_CALL_SITES = 10
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _bucket(elapsed):
+    return min(NUM_BUCKETS - 1, int(elapsed * 1e6).bit_length())
+
+
+def _call_site(depth):
+    """Where the call `depth` frames above the caller came from, as file:line."""
+    frame = sys._getframe(depth + 1)
+    return "{0}:{1}".format(os.path.basename(frame.f_code.co_filename), frame.f_lineno)
+
+
+class PrimitiveStats(object):
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.lock = threading.Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_histogram = [0] * NUM_BUCKETS
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+        self.hold_histogram = [0] * NUM_BUCKETS
+        self.call_sites = collections.Counter()
+
+        with _registry_lock:
+            _registry.append(self)
+
+    def record_wait(self, elapsed, site = None):
+        """Records an acquisition, that had to wait (from site) unless elapsed is 0."""
+        with self.lock:
+            self.acquisitions += 1
+            self.wait_histogram[_bucket(elapsed)] += 1
+            if site is not None:
+                self.contended += 1
+                self.wait_total += elapsed
+                self.wait_max = max(self.wait_max, elapsed)
+                self.call_sites[site] += 1
+
+    def record_hold(self, elapsed):
+        with self.lock:
+            self.hold_total += elapsed
+            self.hold_max = max(self.hold_max, elapsed)
+            self.hold_histogram[_bucket(elapsed)] += 1
+
+    def summary(self):
+        with self.lock:
+            return {
+                "kind": self.kind,
+                "name": self.name,
+                "acquisitions": self.acquisitions,
+                "contended": self.contended,
+                "wait_total": self.wait_total,
+                "wait_max": self.wait_max,
+                "wait_histogram": list(self.wait_histogram),
+                "hold_total": self.hold_total,
+                "hold_max": self.hold_max,
+                "hold_histogram": list(self.hold_histogram),
+                "call_sites": dict(self.call_sites.most_common(NUM_CALL_SITES)),
+            }
+
+
+def _timed_acquire(acquire, stats, blocking, timeout, depth):
+    """Acquires without waiting if it can, otherwise waits and records where from."""
+    if acquire(False):
+        stats.record_wait(0.0)
+        return True
+    if not blocking:
+        return False
+
+    start = time.perf_counter()
+    acquired = acquire(True, timeout)
+    if acquired:
+        stats.record_wait(time.perf_counter() - start, _call_site(depth + 1))
+    return acquired
+
+
+class ProfiledLock(object):
+    def __init__(self, name = None, depth = 1, lock = None):
+        self._lock = lock if lock is not None else threading.Lock()
+        self.stats = PrimitiveStats("Lock", name or _call_site(depth))
+        self._acquired_at = None
+
+    def acquire(self, blocking = True, timeout = -1, _depth = 1):
+        acquired = _timed_acquire(self._lock.acquire, self.stats, blocking, timeout, _depth)
+        if acquired:
+            self._acquired_at = time.perf_counter()
+        return acquired
+
+    def release(self):
+        self.stats.record_hold(time.perf_counter() - self._acquired_at)
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    def __enter__(self):
+        return self.acquire(_depth = 2)
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class ProfiledRLock(ProfiledLock):
+    """Only the outermost acquire and release are timed, the rest always succeed straight away."""
+
+    def __init__(self, name = None, depth = 1, lock = None):
+        super(ProfiledRLock, self).__init__(name or _call_site(depth), lock = lock if lock is not None
+                                            else threading.RLock())
+        self.stats.kind = "RLock"
+        # Only ever changed by the thread holding the lock.
+        self._count = 0
+
+    def acquire(self, blocking = True, timeout = -1, _depth = 1):
+        acquired = _timed_acquire(self._lock.acquire, self.stats, blocking, timeout, _depth)
+        if acquired:
+            self._count += 1
+            if self._count == 1:
+                self._acquired_at = time.perf_counter()
+        return acquired
+
+    def release(self):
+        self._count -= 1
+        if self._count == 0:
+            self.stats.record_hold(time.perf_counter() - self._acquired_at)
+        self._lock.release()
+
+
+class ProfiledSemaphore(object):
+    """Only waits are recorded, as a semaphore is often released by someone else."""
+
+    def __init__(self, value = 1, name = None, depth = 1):
+        self._semaphore = threading.Semaphore(value)
+        self.stats = PrimitiveStats("Semaphore", name or _call_site(depth))
+
+    def acquire(self, blocking = True, timeout = None, _depth = 1):
+        return _timed_acquire(self._semaphore.acquire, self.stats, blocking, timeout, _depth)
+
+    def release(self):
+        self._semaphore.release()
+
+    def __enter__(self):
+        return self.acquire(_depth = 2)
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class ProfiledEvent(object):
+    def __init__(self, name = None, depth = 1):
+        self._event = threading.Event()
+        self.stats = PrimitiveStats("Event", name or _call_site(depth))
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def set(self):
+        self._event.set()
+
+    def clear(self):
+        self._event.clear()
+
+    def wait(self, timeout = None):
+        if self._event.is_set():
+            self.stats.record_wait(0.0)
+            return True
+
+        start = time.perf_counter()
+        result = self._event.wait(timeout)
+        self.stats.record_wait(time.perf_counter() - start, _call_site(1))
+        return result
+
+
+class ProfiledCondition(object):
+    """Acquiring its lock is recorded like a lock, and waiting on it separately (as Condition.wait)."""
+
+    def __init__(self, lock = None, name = None, depth = 1):
+        name = name or _call_site(depth)
+        if isinstance(lock, ProfiledLock):
+            self._lock = lock
+        else:
+            # Keeps using a plain lock it's given, as others may be holding it too, or makes
+            # an RLock like threading.Condition does.
+            self._lock = ProfiledRLock(name = name, lock = lock)
+            self._lock.stats.kind = "Condition"
+        self._condition = threading.Condition(self._lock._lock)
+        self.wait_stats = PrimitiveStats("Condition.wait", name)
+
+    def acquire(self, blocking = True, timeout = -1):
+        return self._lock.acquire(blocking, timeout, _depth = 2)
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        return self._lock.acquire(_depth = 2)
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+    def wait(self, timeout = None, _depth = 1):
+        # The lock isn't held while waiting, however many times it was acquired.
+        self._lock.stats.record_hold(time.perf_counter() - self._lock._acquired_at)
+        count = getattr(self._lock, "_count", None)
+        if count is not None:
+            self._lock._count = 0
+        start = time.perf_counter()
+        result = self._condition.wait(timeout)
+        if count is not None:
+            self._lock._count = count
+        self._lock._acquired_at = time.perf_counter()
+        self.wait_stats.record_wait(self._lock._acquired_at - start, _call_site(_depth))
+        return result
+
+    def wait_for(self, predicate, timeout = None):
+        end = None if timeout is None else time.perf_counter() + timeout
+        result = predicate()
+        while not result:
+            remaining = None if end is None else end - time.perf_counter()
+            if remaining is not None and remaining <= 0:
+                break
+            self.wait(remaining, _depth = 2)
+            result = predicate()
+        return result
+
+    def notify(self, n = 1):
+        self._condition.notify(n)
+
+    def notify_all(self):
+        self._condition.notify_all()
+
+
+class ProfiledBarrier(object):
+    def __init__(self, parties, action = None, timeout = None, name = None, depth = 1):
+        self._barrier = threading.Barrier(parties, action, timeout)
+        self.stats = PrimitiveStats("Barrier", name or _call_site(depth))
+
+    def wait(self, timeout = None):
+        start = time.perf_counter()
+        index = self._barrier.wait(timeout)
+        self.stats.record_wait(time.perf_counter() - start, _call_site(1))
+        return index
+
+    def reset(self):
+        self._barrier.reset()
+
+    def abort(self):
+        self._barrier.abort()
+
+    @property
+    def parties(self):
+        return self._barrier.parties
+
+    @property
+    def n_waiting(self):
+        return self._barrier.n_waiting
+
+    @property
+    def broken(self):
+        return self._barrier.broken
+
+
+# The names problems use, the plain threading ones unless profiling.
+
+def Lock(name = None):
+    return ProfiledLock(name, depth = 2) if ENABLED else threading.Lock()
+
+
+def RLock(name = None):
+    return ProfiledRLock(name, depth = 2) if ENABLED else threading.RLock()
+
+
+def Semaphore(value = 1, name = None):
+    return ProfiledSemaphore(value, name, depth = 2) if ENABLED else threading.Semaphore(value)
+
+
+def Event(name = None):
+    return ProfiledEvent(name, depth = 2) if ENABLED else threading.Event()
+
+
+def Condition(lock = None, name = None):
+    return ProfiledCondition(lock, name, depth = 2) if ENABLED else threading.Condition(lock)
+
+
+def Barrier(parties, action = None, timeout = None, name = None):
+    return ProfiledBarrier(parties, action, timeout, name, depth = 2) if ENABLED \
+        else threading.Barrier(parties, action, timeout)
+
+
+# Everything else can come from threading as usual.
+Thread = threading.Thread
+
+
+def summary():
+    """The stats of every instrumented primitive made so far."""
+    with _registry_lock:
+        return [stats.summary() for stats in _registry]
+
+
+def _print_summary():
+    print(MARKER + json.dumps(summary()))
+    sys.stdout.flush()
+
+
+def parse_summary(logs):
+    """Finds the summary in a test's output, returns it or None if there isn't one."""
+    if logs is None:
+        return None
+    if isinstance(logs, bytes):
+        logs = logs.decode("utf-8", "replace")
+
+    for line in reversed(logs.splitlines()):
+        line = line.strip()
+        if line.startswith(MARKER):
+            return json.loads(line[len(MARKER):])
+    return None
+
+
+if ENABLED:
+    atexit.register(_print_summary)
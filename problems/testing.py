@@ -1,30 +1,49 @@
 import argparse
+import ast
 import collections
+import functools
+import json
 import logging
 import os
-import pickle
 import sys
 import time
-from typing import List
-from matplotlib import pyplot as plt
-import docker
-import pandas as pd
 import yaml
 
-from docker.errors import BuildError, APIError
-from docker.models.containers import Container
+import benchmark_stats
+import executors
+import plotting
+import scheduler
+import sync_profile
+from build_cache import hash_dockerfile
+from manifest import ResultManifest
+from results_store import ResultStore
+from stats_aggregator import StatsAggregator
 
 TestResult = collections.namedtuple("TestResult", ["time_taken", "status", "iteration",
-                                                   "test_time", "system_info"],
-                                    verbose = False,
+                                                   "test_time", "system_info", "sync_profile"],
                                     rename = False)
 
+TestTarget = collections.namedtuple("TestTarget", ["test", "image_name", "test_command", "entry_command",
+                                                   "problem", "runtime", "file",
+                                                   "key", "source_hash", "toolchain", "samples", "stale", "previous"])
 
-def get_args():
-    DATA_PATH = "argparse.yaml"
+# Modules of the harness Python problems can import, added next to the ones that do in their images.
+HARNESS_MODULES = ["sync_profile.py", "problem_metrics.py"]
+# Code under test that more than one problem uses, added the same way.
+SHARED_MODULES = ["problem_buffers.py"]
 
-    with open(DATA_PATH, "r") as file:
-        configs = yaml.load(file)
+# argparse.yaml can only name the type of an argument.
+ARG_TYPES = {
+    "int": int,
+    "float": float,
+    "str": str,
+    "bool": lambda value: str(value).lower() in ["1", "true", "yes"],
+}
+
+
+def get_args(data_path = "argparse.yaml"):
+    with open(data_path, "r") as file:
+        configs = yaml.safe_load(file)
 
     arg_lists = []
     parser = argparse.ArgumentParser()
@@ -35,7 +54,10 @@ def get_args():
         arg_lists.append(arg)
 
         for conf in group.keys():
-            arg.add_argument("--" + str(conf), **group[conf])
+            options = dict(group[conf])
+            if "type" in options:
+                options["type"] = ARG_TYPES[options["type"]]
+            arg.add_argument("--" + str(conf), **options)
 
     parsed, unparsed = parser.parse_known_args()
 
@@ -68,8 +90,41 @@ def __get_lang(file):
         yield "go"
 
 
+def _get_imports(root, files):
+    """The names of the top level modules any of a problem's Python files import."""
+    imported = set()
+    for file in files:
+        if not file.endswith(".py"):
+            continue
+        with open(os.path.join(root, file), "r") as f:
+            tree = ast.parse(f.read(), file)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                imported.update(alias.name.split(".")[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module is not None and node.level == 0:
+                imported.add(node.module.split(".")[0])
+    return imported
+
+
+def _get_shared_modules(root, files):
+    """The harness and shared modules a problem imports, and the ones those import in turn."""
+    imported = _get_imports(root, files)
+    modules = []
+    while True:
+        added = [module for module in HARNESS_MODULES + SHARED_MODULES
+                 if module[:-len(".py")] in imported and module not in modules]
+        if len(added) == 0:
+            return sorted(modules)
+        modules.extend(added)
+        imported.update(_get_imports(".", added))
+
+
 def generate_docker_file(root, files):
     for file in files:
+        # Files starting with an underscore are helpers for the other files, not tests.
+        if file.startswith("_"):
+            continue
+
         # Could build with multiple executables. (like pypy and python)
         for lang in __get_lang(file):
             if lang == "go":
@@ -95,6 +150,10 @@ def generate_docker_file(root, files):
             requirements = ""
             if files.__contains__("requirements.txt"):
                 requirements = os.path.join(root, "requirements.txt")
+            # Packages that only install on one runtime, like numpy (which pypy has no wheels of).
+            lang_requirements = ""
+            if files.__contains__("requirements_{0}.txt".format(lang)):
+                lang_requirements = os.path.join(root, "requirements_{0}.txt".format(lang))
 
             if not os.path.exists("images"):
                 os.mkdir("images")
@@ -126,9 +185,20 @@ def generate_docker_file(root, files):
                     "COPY --from=test_builder /go/src/github.com/mattpaletta/Little-Book-Of-Semaphores/app ./app")
                 dockerfile_contents.append("ADD {0} /app/{1}".format(os.path.join(root, file), file))
 
+                # So tests can import from the other files of the same problem.
+                for other in sorted(files):
+                    if other != file and other.endswith(".py"):
+                        dockerfile_contents.append("ADD {0} /app/{1}".format(os.path.join(root, other), other))
+                # And the shared modules they import, so editing one only makes the problems using it stale.
+                for module in _get_shared_modules(root, files):
+                    dockerfile_contents.append("ADD {0} /app/{0}".format(module))
+
             if requirements != "" and lang in ["pypy", "python"]:
                 dockerfile_contents.append("ADD {0} /app/requirements.txt".format(requirements))
                 dockerfile_contents.append("RUN pip3 install -r requirements.txt")
+            if lang_requirements != "":
+                dockerfile_contents.append("ADD {0} /app/requirements_{1}.txt".format(lang_requirements, lang))
+                dockerfile_contents.append("RUN pip3 install -r requirements_{0}.txt".format(lang))
 
             output_dockerfile_name = "Dockerfile_{0}_{1}".format(root.strip("./"), lang)
 
@@ -137,332 +207,356 @@ def generate_docker_file(root, files):
             yield "images/" + output_dockerfile_name, test_command, entry_command, file
 
 
-def determine_auto_skip(configs):
-    # We have a cache.
-    should_cache = False
-    if os.path.exists("cache.pkl"):
-        with open("cache.pkl", "rb") as f:
-            cache = pickle.load(f)
-        should_cache = cache == configs
-
-    with open("cache.pkl", "wb") as f:
-        pickle.dump(configs, f)
-    return should_cache
-
 def avg(lst):
     return sum(lst) / len(list(lst))
 
 
-if __name__ == "__main__":
-    _configure_logging()
-    configs = get_args()
+def _get_test_file(entry_command, file):
+    if entry_command.startswith("./"):
+        return (file.split(" ")[-1]).split(".")[0]  # Get the filename
+    return (entry_command.split(" ")[-1]).split(".")[0]
 
 
-    # Only skip tests if the configs haven't changed from last time.
-    SIZE_OF_SAMPLE = configs.sample_size
-    AUTO_SKIP = determine_auto_skip(configs) if configs.auto_skip else False
+def _get_labels(target, run_id = None):
+    return {"run_id": run_id,
+            "problem": target.problem,
+            "runtime": target.runtime,
+            "file": target.file,
+            "source_hash": target.source_hash,
+            "toolchain": target.toolchain}
 
-    logging.info("Getting docker client")
-    client = docker.client.from_env()
 
-    all_test_data = []
-
-    logging.info("Finding tests.")
+def build_test_images(executor, manifest, store, sample_size, auto_skip, problems = None):
+    """Builds every test (of some problems, or all of them), yielding the ones that have samples left to run."""
     for test, files in _get_tests():
+        if problems is not None and test[2:] not in problems:
+            continue
         logging.info("Found test: {0}".format(test))
         for dockerfile, test_command, entry_command, file in generate_docker_file(test, files):
-            if entry_command.startswith("./"):
-                test_file = (file.split(" ")[-1]).split(".")[0]  # Get the filename
-            else:
-                test_file = (entry_command.split(" ")[-1]).split(".")[0]
-
-            first_run_csv = "results/tables/{0}.csv".format(
-                test[2:] + "_first_" + entry_command.split(" ")[0] + "_" + test_file)
-            overall_run_csv = "results/tables/{0}.csv".format(
-                test[2:] + "_" + entry_command.split(" ")[0] + "_" + test_file)
-
-            if AUTO_SKIP and os.path.exists(first_run_csv) and os.path.exists(overall_run_csv):
-                logging.info("Test already run.  Skipping. (FROM AUTO_SKIP")
-                continue
-
-            docker_image = None
+            test_file = _get_test_file(entry_command, file)
 
             docker_image_name = "mattpaletta/csc_464_a1_{0}_{1}:latest".format(
                     dockerfile[len("images/Dockerfile_"):].lower(),
                     test_file
             )
 
-            try:
-                logging.info("Building test image: {0}".format(docker_image_name))
-
-                docker_image, build_logs = client.images.build(path = ".",
-                                                               dockerfile = "./" + dockerfile,
-                                                               tag = docker_image_name)
+            target = TestTarget(test = test,
+                                image_name = docker_image_name,
+                                test_command = test_command,
+                                entry_command = entry_command,
+                                problem = test[2:],
+                                runtime = entry_command.split(" ")[0],
+                                file = test_file,
+                                key = "/".join([test[2:], entry_command.split(" ")[0], test_file]),
+                                source_hash = hash_dockerfile(dockerfile),
+                                toolchain = None,
+                                samples = (),
+                                stale = True,
+                                previous = ())
+            target = target._replace(toolchain = executor.get_toolchain(target, dockerfile))
+
+            # The samples we're adding to count towards deciding when to stop.
+            previous_df = store.load_current("samples", problem = target.problem, runtime = target.runtime,
+                                             file = target.file, source_hash = target.source_hash,
+                                             toolchain = target.toolchain)
+            previous = previous_df["time_taken"] if len(previous_df) > 0 else []
+
+            if auto_skip:
+                samples, stale = manifest.get_missing_samples(target.key, target.source_hash, target.toolchain,
+                                                              sample_size)
+                # Results that aren't in the store can't be appended to.
+                if stale or len(previous) == 0:
+                    samples, stale = list(range(sample_size)), True
+            else:
+                samples, stale = list(range(sample_size)), True
 
-                logging.info("Built image: {0}".format(docker_image_name))
-            except BuildError as e:
-                print(e)
+            if len(samples) == 0:
+                logging.info("Test already run.  Skipping. (FROM AUTO_SKIP)")
                 continue
-            except APIError as e:
-                print(e)
-                exit(1)
-
-            logging.info("Running test: {0} with samples: {1}".format(docker_image_name, SIZE_OF_SAMPLE))
-
-            test_results = []
-            current_test = 1
-            while current_test <= SIZE_OF_SAMPLE:
-                container_settings = {
-                    # "cpu_period": 1000,
-                    # "cpu_quota": 1000,
-                    # "cpuset_cpus": "0",
-                    "stdout": True,
-                    "stderr": True,
-                    "detach": True,
-                    "tty": True
-                }
-
-                logging.info("Starting Test: {0}/{1}".format(current_test, SIZE_OF_SAMPLE))
-
-                logging.info("Running standard benchmark")
-                # MARK:// Run the 'before benchmark'
-                before_container: Container = client.containers.run(image = docker_image_name,
-                                                                    command = 'sh -c "{0}"'.format(test_command),
-                                                                    **container_settings)
-                start = time.time()
-                before_code = before_container.wait()["StatusCode"]
-                end = time.time()
-                before_benchmark = end - start
-                before_container.remove()
-                if before_code != 0:
-                    logging.warning("Benchmark failed.  Retrying after timeout.")
-                    time.sleep(10)
-                    continue
-
-
-                # MARK:// Run the 'after benchmark'
-                logging.info("Running test")
-                test_container: Container = client.containers.run(image = docker_image_name,
-                                                                  command = 'sh -c "{0}"'.format(entry_command),
-                                                                  **container_settings)
-                start = time.time()
-                stats = test_container.stats(decode=True)
-                processed_stats = []
-                for s in stats:
-                    cpu_usage = s["cpu_stats"]["cpu_usage"]["total_usage"]
-                    if cpu_usage == 0 and len(s["memory_stats"].keys()) == 0:
-                        break
-                    processed_stats.append(s)
-
-                test_exit_code = test_container.wait()["StatusCode"]
-                end = time.time()
-
-
-
-                test_time = end - start
-                logging.info("Test: {0}/{1} {2}".format(current_test, SIZE_OF_SAMPLE, "passed" if test_exit_code == 0 else "FAILED"))
-
-                if test_exit_code != 0:
-                    print(test_container.logs())
-
-                test_container.remove()
-
-
-                # MARK:// Run the 'after benchmark'
-                logging.info("Running standard benchmark")
-                after_container: Container = client.containers.run(image = docker_image_name,
-                                                                   command = 'sh -c "{0}"'.format(test_command),
-                                                                   **container_settings)
-                start = time.time()
-                after_code = after_container.wait()["StatusCode"]
-                end = time.time()
-                after_benchmark = end - start
-                after_container.remove()
-                if after_code != 0:
-                    logging.warning("Benchmark failed.  Retrying after timeout.")
-                    time.sleep(10)
-                    continue
-
-                change_percent = ((float(after_benchmark) - before_benchmark) / before_benchmark) * 100
-
-                if change_percent >= 5.0:
-                    logging.info("System seems to have changed by: {0}%. Retrying test after timeout.".format(round(change_percent, 4)))
-                    time.sleep(10)
-                    continue
-
-                logging.info("Saving results")
-                test_results.append(TestResult(time_taken = test_time,
-                                               test_time = avg([before_benchmark, after_benchmark]),
-                                               iteration = current_test-1,
-                                               status = test_exit_code,
-                                               system_info = processed_stats))
-                current_test += 1
-
-            logging.info("Processing {0} results".format(len(test_results)))
-            # Process all results from that test.
-            if not os.path.exists("results"):
-                os.mkdir("results")
-
-
-            # Plot CPU usage (just from 1 run)
-            # Plot memory usage
-            usage_df = []
-
-            logging.info("Processing first run info")
-            first_run = test_results[0]
-            # Observe the entire run.
-            for stats in first_run.system_info:
-                date_recorded = stats["read"]
-
-                total_cpu_usage: int = stats["cpu_stats"]["cpu_usage"]["total_usage"]
-                user_cpu_usage: int = stats["cpu_stats"]["cpu_usage"]["usage_in_kernelmode"]
-                kernel_cpu_usage: int = stats["cpu_stats"]["cpu_usage"]["usage_in_usermode"]
-                per_cpu_usage: List[int] = stats["cpu_stats"]["cpu_usage"]["percpu_usage"]
-
-                avg_memory_usage = stats["memory_stats"]["usage"]
-                max_memory_usage = stats["memory_stats"]["max_usage"]
-                memory_cache = stats["memory_stats"]["stats"]["cache"]
-
-                stat_data = {"time_recorded": date_recorded,
-                                 "total_cpu_usage": total_cpu_usage,
-                                 "user_cpu_usage": user_cpu_usage,
-                                 "kernel_cpu_usage": kernel_cpu_usage,
-                                 "avg_per_usage": avg(per_cpu_usage),
-                                 "avg_memory_usage": avg_memory_usage,
-                                 "max_memory_usage": max_memory_usage,
-                                 "memory_cache": memory_cache
-                                 }
-                usage_df.append(stat_data)
-
-            if not os.path.exists("results/tables"):
-                os.mkdir("results/tables")
-
-            logging.info("Writing first run info")
-            pd.DataFrame(usage_df).to_csv(first_run_csv)
-
-            # For the table
-            # Test Name and executor run
-            # Get max CPU usage (per core)
-            # Get avg CPU usage (across cores)
-            # Get max memory usage
-
-            logging.info("Processing overall run data")
-            general_df = []
-
-            for result in test_results:
-                iteration = result.iteration
-                time_taken = result.time_taken
-                test_time = result.test_time
-                stats = result.system_info
-
-                # Test_time is the average test time
-                normalized_test_time = (1 / test_time) * time_taken
-
-                cpu_usage_list = list(map(lambda stat: stat["cpu_stats"]["cpu_usage"]["total_usage"], stats))
-                max_cpu_usage = max(cpu_usage_list) if len(cpu_usage_list) > 0 else 0.0
-
-                avg_memory_usage_list = list(map(lambda stat: stat["memory_stats"]["usage"], stats))
-                avg_memory_usage = avg(avg_memory_usage_list) if len(avg_memory_usage_list) > 0 else 0
-
-                max_memory_usage_list = list(map(lambda stat: stat["memory_stats"]["max_usage"], stats))
-                max_memory_usage = max(max_memory_usage_list) if len(max_memory_usage_list) > 0 else 0
-
-                stat_data = {
-                                    "iteration"   : iteration,
-                                    "max_cpu_usage" : max_cpu_usage,
-                                    "avg_memory_usage"  : avg_memory_usage,
-                                    "max_memory_usage": max_memory_usage,
-                                    "time_taken": time_taken,
-                                    "test_time": test_time,
-                                    "normalized_test": normalized_test_time
-                                 }
-
-                general_df.append(stat_data)
-
-            logging.info("Writing overall run data")
-            pd.DataFrame(general_df).to_csv(overall_run_csv)
 
-    logging.info("Plotting test results.")
-    for test, files in _get_tests():
-        logging.info("Found test: {0}".format(test))
-        for dockerfile, test_command, entry_command, file in generate_docker_file(test, files):
-            if entry_command.startswith("./"):
-                test_file = (file.split(" ")[-1]).split(".")[0]  # Get the filename
-            else:
-                test_file = (entry_command.split(" ")[-1]).split(".")[0]
+            target = target._replace(samples = tuple(samples),
+                                     stale = stale,
+                                     previous = () if stale else tuple(previous))
+
+            if executor.build(target, dockerfile):
+                yield target
+
+
+def run_sample(executor, target, iteration, cpuset = None, max_drift = 5.0, limits = None):
+    """Runs a single sample of a test, bracketed by the standard benchmark (under the same CPU limits).
+
+    Returns None if the sample has to be run again, because the benchmark failed or
+    the system changed by `max_drift` percent or more while the test was running.
+    """
+    sample_name = "{0} [{1}]".format(target.image_name, iteration)
+    # The benchmark only measures how fast the cores are, a memory limit is just for the test.
+    benchmark_limits = limits._replace(memory = None) if limits is not None else None
+
+    logging.info("Running standard benchmark: {0}".format(sample_name))
+    # MARK:// Run the 'before benchmark'
+    before = executor.run(target, target.test_command, cpuset = cpuset, limits = benchmark_limits)
+    before_benchmark = before.elapsed
+    if before.exit_code != 0:
+        logging.warning("Benchmark failed: {0}".format(sample_name))
+        return None
+
+
+    # MARK:// Run the test
+    logging.info("Running test: {0}".format(sample_name))
+    # Only the first sample's usage is plotted over time.
+    aggregator = StatsAggregator(keep_series = iteration == target.samples[0])
+    test = executor.run_with_stats(target, target.entry_command, aggregator, cpuset = cpuset, limits = limits)
+    test_exit_code = test.exit_code
+    test_time = test.elapsed
+    logging.info("Test: {0} {1}".format(sample_name, "passed" if test_exit_code == 0 else "FAILED"))
+
+    if test_exit_code != 0:
+        print(test.logs)
+
+
+    # MARK:// Run the 'after benchmark'
+    logging.info("Running standard benchmark: {0}".format(sample_name))
+    after = executor.run(target, target.test_command, cpuset = cpuset, limits = benchmark_limits)
+    after_benchmark = after.elapsed
+    if after.exit_code != 0:
+        logging.warning("Benchmark failed: {0}".format(sample_name))
+        return None
+
+    change_percent = ((float(after_benchmark) - before_benchmark) / before_benchmark) * 100
+
+    if change_percent >= max_drift:
+        logging.info("System seems to have changed by: {0}%. ({1})".format(round(change_percent, 4), sample_name))
+        return None
+
+    return TestResult(time_taken = test_time,
+                      test_time = avg([before_benchmark, after_benchmark]),
+                      iteration = iteration,
+                      status = test_exit_code,
+                      system_info = test.stats,
+                      sync_profile = sync_profile.parse_summary(test.logs))
+
+
+def run_sample_job(executor, cores, max_drift, job):
+    """Runs a sample on its own set of cores, retrying after a timeout until it is valid."""
+    target, iteration = job
+    while True:
+        cpuset = cores.acquire()
+        try:
+            result = run_sample(executor, target, iteration, cpuset = cpuset, max_drift = max_drift)
+        finally:
+            cores.release(cpuset)
+
+        if result is not None:
+            return result
+
+        logging.warning("Retrying after timeout: {0} [{1}]".format(target.image_name, iteration))
+        time.sleep(10)
+
+
+class TestProgress(object):
+    """Decides which samples of a test to run next.
+
+    Warmup samples (negative iterations, thrown away) are run first.  Then samples are run
+    a few at a time until the confidence interval of the time taken is tight enough, or
+    the test runs out of samples.
+    """
+
+    def __init__(self, target, configs):
+        self.target = target
+        self.configs = configs
+        self.warmups_left = configs.warmup
+        self.next_sample = 0
+        self.in_flight = 0
+        self.results = []
+        self.converged = False
+
+    def start(self):
+        if self.warmups_left > 0:
+            self.in_flight = self.warmups_left
+            return [(self.target, -(i + 1)) for i in range(self.warmups_left)]
+        return self._next_samples(max(1, self.configs.min_samples))
+
+    def _next_samples(self, count):
+        count = min(count, len(self.target.samples) - self.next_sample)
+        jobs = [(self.target, iteration) for iteration in self.target.samples[self.next_sample:self.next_sample + count]]
+        self.next_sample += count
+        self.in_flight += count
+        return jobs
+
+    def finish(self, iteration, result):
+        """Records a finished sample, returns the jobs to run next."""
+        self.in_flight -= 1
+        if iteration < 0:
+            self.warmups_left -= 1
+            return self.start() if self.warmups_left == 0 else []
+
+        self.results.append(result)
+        if self.converged:
+            return []
+
+        values = list(self.target.previous) + [r.time_taken for r in self.results]
+        self.converged = benchmark_stats.is_converged(values,
+                                                      target_ci = self.configs.target_ci,
+                                                      min_samples = self.configs.min_samples,
+                                                      confidence = self.configs.confidence,
+                                                      resamples = self.configs.bootstrap_resamples,
+                                                      threshold = self.configs.outlier_threshold)
+        if self.converged:
+            logging.info("Results are conclusive after {0} samples: {1}".format(len(values), self.target.image_name))
+            return []
+        return self._next_samples(1)
+
+    def is_done(self):
+        return self.in_flight == 0 and (self.converged or self.next_sample == len(self.target.samples))
+
+
+def write_summary(store, run_id, target, general_df, configs):
+    """Stores the median and bootstrap CI of all of the test's current samples."""
+    row = {}
+    for metric in ["time_taken", "normalized_test"]:
+        summary = benchmark_stats.summarize(general_df[metric],
+                                            confidence = configs.confidence,
+                                            resamples = configs.bootstrap_resamples,
+                                            threshold = configs.outlier_threshold)
+        for name, value in summary.items():
+            row[metric + "_" + name] = value
+
+    logging.info("Writing summary")
+    store.append("summaries", _get_labels(target, run_id), [row])
+
+
+def write_test_results(store, run_id, target, test_results, configs):
+    """Stores the results of a test, adding to the existing ones unless they're stale."""
+    logging.info("Processing {0} results".format(len(test_results)))
+    labels = _get_labels(target, run_id)
+
+    test_results = sorted(test_results, key = lambda result: result.iteration)
+
+    # Plot CPU usage (just from 1 run)
+    # Plot memory usage
+    logging.info("Processing first run info")
+    first_run = test_results[0]
+    # Observe the entire run.
+    usage_df = first_run.system_info.series_columns()
+
+    # Stale results are replaced by these, rather than added to.
+    if target.stale:
+        for table in ["first_run", "samples", "sync_profile", "summaries"]:
+            store.supersede(table, labels)
+
+    # Only the first sample is plotted, so keep the one we already have.
+    if target.stale or first_run.iteration == 0:
+        logging.info("Writing first run info")
+        store.append("first_run", labels, usage_df)
+
+    # For the table
+    # Test Name and executor run
+    # Get CPU time and usage (percentage, where one core is 100%)
+    # Get max memory usage
+
+    logging.info("Processing overall run data")
+    general_df = []
+
+    for result in test_results:
+        iteration = result.iteration
+        time_taken = result.time_taken
+        test_time = result.test_time
+
+        # Test_time is the average test time
+        normalized_test_time = (1 / test_time) * time_taken
+
+        stat_data = {
+                            "iteration"   : iteration,
+                            "time_taken": time_taken,
+                            "test_time": test_time,
+                            "normalized_test": normalized_test_time
+                         }
+        stat_data.update(result.system_info.summary())
+
+        general_df.append(stat_data)
+
+    # Outliers among every current sample, including the ones from earlier runs.
+    previous = list(target.previous)
+    outliers = benchmark_stats.find_outliers(previous + [row["time_taken"] for row in general_df],
+                                             configs.outlier_threshold)
+    for row, outlier in zip(general_df, outliers[len(previous):]):
+        row["outlier"] = bool(outlier)
+
+    logging.info("Writing overall run data")
+    store.append("samples", labels, general_df)
+
+    # One row per instrumented primitive per sample, when they were profiled.
+    profile_df = []
+    for result in test_results:
+        for primitive in result.sync_profile or []:
+            row = {"iteration": result.iteration}
+            for name, value in primitive.items():
+                row[name] = json.dumps(value) if isinstance(value, (list, dict)) else value
+            profile_df.append(row)
+
+    if len(profile_df) > 0:
+        logging.info("Writing synchronisation profile")
+        store.append("sync_profile", labels, profile_df)
+
+    # The summary covers every current sample, including the ones from earlier runs.
+    general_df = store.load_current("samples", problem = target.problem, runtime = target.runtime,
+                                    file = target.file, source_hash = target.source_hash,
+                                    toolchain = target.toolchain)
+    write_summary(store, run_id, target, general_df, configs)
+
 
-            first_run_csv = "results/tables/{0}.csv".format(
-                test[2:] + "_first_" + entry_command.split(" ")[0] + "_" + test_file)
-            overall_run_csv = "results/tables/{0}.csv".format(
-                test[2:] + "_" + entry_command.split(" ")[0] + "_" + test_file)
+if __name__ == "__main__":
+    _configure_logging()
+    configs = get_args()
+    # Stopping any earlier, a regression couldn't be significant (3 samples a side can't get below p = 0.08).
+    testable_samples = benchmark_stats.min_testable_samples(configs.alpha)
+    if configs.min_samples < testable_samples:
+        logging.info("Raising min_samples from {0} to {1}, to be able to reach alpha = {2}".format(
+            configs.min_samples, testable_samples, configs.alpha))
+        configs.min_samples = testable_samples
+    if configs.sample_size < testable_samples:
+        logging.warning("A sample_size of {0} is too few for compare.py to find regressions at alpha = {1}".format(
+            configs.sample_size, configs.alpha))
 
-            if not os.path.exists("results/figures"):
-                os.mkdir("results/figures")
 
-            if not os.path.exists("results/figures/first"):
-                os.mkdir("results/figures/first")
+    SIZE_OF_SAMPLE = configs.sample_size
+    manifest = ResultManifest()
+    store = ResultStore()
+    run_id = store.start_run(configs)
 
-            if not os.path.exists("results/figures/overall"):
-                os.mkdir("results/figures/overall")
+    executor = executors.get_executor(configs)
 
-            if not os.path.exists(first_run_csv):
-                logging.warning("First run CSV not found.")
-            else:
-                df = pd.read_csv(first_run_csv, index_col = 0)
-                if len(df) == 0:
-                    logging.warning("Found empty dataframe")
-                    continue
-
-                # TODO:// Calculate CPU usage percentage.
-                # cpuDelta = res.cpu_stats.cpu_usage.total_usage - res.precpu_stats.cpu_usage.total_usage
-                # systemDelta = res.cpu_stats.system_cpu_usage - res.precpu_stats.system_cpu_usage
-                # RESULT_CPU_USAGE = cpuDelta / systemDelta * 100
-
-
-                time_recorded = df["time_recorded"]
-                for column in df.columns:
-                    if column == "time_recorded":
-                        continue
-
-                    plot_output = "results/figures/first/" + test[2:] + "_first_" + entry_command.split(" ")[0] + "_" + test_file + "_" + column + ".png"
-
-                    if os.path.exists(plot_output):
-                        os.remove(plot_output)
-
-                    plt.plot(df.index, df[column])
-                    plt.xlabel('sample')
-                    plt.ylabel(column)
-                    plt.title(test[2:] + "_first_" + entry_command.split(" ")[0] + "_" + test_file + "_" + column)
-                    plt.grid(True)
-                    plt.savefig(plot_output)
-                    # plt.show()
-                    plt.close()
-
-            if not os.path.exists(overall_run_csv):
-                logging.warning("First run CSV not found.")
-            else:
-                df = pd.read_csv(overall_run_csv, index_col = 0)
-                if len(df) == 0:
-                    logging.warning("Found empty dataframe")
-                    continue
-
-                time_recorded = df["iteration"]
-                for column in df.columns:
-                    if column == "iteration":
-                        continue
-
-                    plot_output = "results/figures/overall/" + test[2:] + "_samples_" + entry_command.split(" ")[
-                        0] + "_" + test_file + "_" + column + ".png"
-
-                    if os.path.exists(plot_output):
-                        os.remove(plot_output)
-
-                    plt.plot(df.index, df[column])
-                    plt.xlabel('iteration')
-                    plt.ylabel(column)
-                    plt.title(test[2:] + "_samples_" + entry_command.split(" ")[0] + "_" + test_file + "_" + column)
-                    plt.grid(True)
-                    plt.savefig(plot_output)
-                    # plt.show()
-                    plt.close()
+    cores = scheduler.get_core_pool(configs.pin_cpus, configs.cores_per_job, configs.workers)
+    workers = scheduler.get_concurrency(configs.workers, cores)
+
+    logging.info("Finding tests.")
+    targets = list(build_test_images(executor, manifest, store, SIZE_OF_SAMPLE, configs.auto_skip))
+    executor.log_build_summary()
+
+    # Every sample is independent, so samples of different tests run side by side and a
+    # test's results are written as soon as it has enough of them.
+    pool = scheduler.JobPool(functools.partial(run_sample_job, executor, cores, configs.max_drift), workers)
+    progress = {target: TestProgress(target, configs) for target in targets}
+    for target in targets:
+        for job in progress[target].start():
+            pool.submit(job)
+
+    logging.info("Running {0} tests with {1} workers".format(len(targets), workers))
+    for (target, iteration), result in pool.results():
+        test_progress = progress[target]
+        for job in test_progress.finish(iteration, result):
+            pool.submit(job)
+
+        if iteration < 0:
+            continue
+
+        logging.info("Saving results: {0} [{1}]".format(target.image_name, iteration))
+        if test_progress.is_done():
+            write_test_results(store, run_id, target, test_progress.results, configs)
+            manifest.record(target.key, target.source_hash, target.toolchain, SIZE_OF_SAMPLE,
+                            [result.iteration for result in test_progress.results], target.stale,
+                            converged = test_progress.converged)
+            del progress[target]
 
+    logging.info("Plotting test results.")
+    plotting.plot_results(store, configs.plot_workers, configs.combined_figures, configs.force_plots)